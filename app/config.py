@@ -15,6 +15,15 @@ class Settings(BaseSettings):
     RAG_EMB_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
     RAG_CHUNK_SIZE: int = 512
     RAG_CHUNK_OVERLAP: int = 50
+    RAG_EMB_BATCH: int = 64  # Chunks per embedding forward pass
+    RAG_EMB_DEVICE: str = "auto"  # auto|cpu|cuda|cuda:N
+    RAG_EMB_PRECISION: str = "auto"  # auto (fp16 on CUDA, else fp32)|fp32|fp16|int8 (CPU dynamic quantization)
+    RAG_INDEX_TYPE: str = "flat"  # flat|hnsw|sq_fp16|pq
+    RAG_HNSW_M: int = 32
+    RAG_PQ_M: int = 48  # PQ sub-quantizers (must divide the embedding dim)
+    RAG_PQ_TRAIN_SIZE: int = 10000  # Chunks buffered before PQ training
+    RAG_QUERY_CACHE_SIZE: int = 256  # Cached query embeddings (0 disables)
+    RAG_RETRIEVE_CACHE_SIZE: int = 1024  # Cached (query, k) retrieval results (0 disables)
     
     # LLM Configuration
     LLM_BACKEND: str = "ollama"  # ollama|vllm|trtllm
@@ -22,6 +31,15 @@ class Settings(BaseSettings):
     # 若出現 "model not found"，請在終端執行：ollama pull <MODEL_ID>
     MODEL_ID: str = "gpt-oss:20b"
     REQUEST_TIMEOUT_S: int = 60
+    # Connection pool caps for LLM backend HTTP calls
+    LLM_MAX_CONNECTIONS: int = 32
+    LLM_MAX_CONNECTIONS_PER_HOST: int = 16
+    # Constrained decoding (JSON schema); requires Ollama >= 0.5 or vLLM guided decoding
+    LLM_GUIDED_DECODING: bool = False
+    # Citation patch reply budget, sized for a short citation array (kept well below
+    # the 900-token decision budget so the patch call stays fast). Reasoning models
+    # count thinking tokens against it; raise it if patch replies come back empty.
+    LLM_CITATION_PATCH_MAX_TOKENS: int = 300
 
     @field_validator("MODEL_ID", mode="before")
     @classmethod
@@ -34,6 +52,10 @@ class Settings(BaseSettings):
             return "gpt-oss:20b"
         return s
     
+    # Prompt budget
+    PROMPT_FHIR_MAX_CHARS: int = 2000
+    PROMPT_AGENT_MAX_ITEMS: int = 3
+    
     # vLLM specific
     VLLM_COMPLETIONS_PATH: str = "/v1/completions"
     VLLM_CHAT_PATH: str = "/v1/chat/completions"
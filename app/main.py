@@ -1,27 +1,54 @@
 """FastAPI main application."""
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from app.schemas import ERASRequest, ERASResponse
+from app.middleware import ASGICors, ASGITimingMiddleware
 from app.services.decision_pipeline import run_decision
-from app.services.retriever_hybrid import HybridRetriever
+from app.services.retriever_hybrid import get_retriever
 from app.services.rag_store_manager import load_manifest, ensure_store_layout
 from app.services.llm.factory import get_llm_backend
+from app.services.trace_logger import trace_logger
 from app.config import settings
+import logging
+import orjson
 import os
+import time
 
-app = FastAPI(title="ERAS CDSS", version="1.0.0")
+logger = logging.getLogger(__name__)
 
-# CORS: allow frontend from any origin (same host or different)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start shared services (retriever, trace writer, LLM pool) and close them on shutdown."""
+    # Load the RAG index once instead of per request, and warm it with a dummy query
+    get_retriever().warmup()
+    trace_logger.start()
+    try:
+        await get_llm_backend().warmup()
+    except Exception as e:
+        logger.warning("LLM backend warmup failed: %s", e)
+    yield
+    await trace_logger.aclose()
+    try:
+        await get_llm_backend().close()
+    except Exception as e:
+        logger.warning("LLM backend close failed: %s", e)
+
+
+app = FastAPI(
+    title="ERAS CDSS",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# CORS: allow frontend from any origin (same host or different)
+app.add_middleware(ASGICors)
+# Timing: x-response-time header on every HTTP response
+app.add_middleware(ASGITimingMiddleware)
+
 # Mount static files
 static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
 if os.path.exists(static_dir):
@@ -39,10 +66,16 @@ async def root():
     return {"message": "ERAS CDSS API", "frontend": "Please ensure static files are available"}
 
 
+# Resolved patients.jsonl path and pre-serialized payload (reloaded when mtime changes)
+_PATIENTS_CACHE = {"path": None, "mtime": 0, "payload": b""}
+
+
 def _get_patients_path():
     """Resolve data/patients.jsonl from project root (works from any cwd)."""
-    import json
     from pathlib import Path
+    cached_path = _PATIENTS_CACHE["path"]
+    if cached_path and os.path.exists(cached_path):
+        return cached_path
     # Project root: parent of app/ (where main.py lives)
     app_dir = Path(__file__).resolve().parent
     project_root = app_dir.parent
@@ -53,35 +86,54 @@ def _get_patients_path():
     ]
     for p in candidates:
         if p.exists():
+            _PATIENTS_CACHE["path"] = str(p)
             return str(p)
     return None
 
 
+def _load_patients_payload(patients_path: str) -> bytes:
+    """Return patients as pre-serialized JSON bytes, re-reading only if the file changed."""
+    mtime = os.stat(patients_path).st_mtime_ns
+    if _PATIENTS_CACHE["payload"] and _PATIENTS_CACHE["mtime"] == mtime:
+        return _PATIENTS_CACHE["payload"]
+    with open(patients_path, "rb") as f:
+        data = f.read()
+    # orjson tolerates the surrounding whitespace, so lines are not stripped
+    patients = [orjson.loads(line) for line in data.splitlines() if line and not line.isspace()]
+    payload = orjson.dumps(patients)
+    _PATIENTS_CACHE["mtime"] = mtime
+    _PATIENTS_CACHE["payload"] = payload
+    return payload
+
+
 @app.get("/api/patients")
 async def get_patients():
     """Return 30 demo patients from data/patients.jsonl."""
-    import json
     patients_path = _get_patients_path()
     if not patients_path:
         raise HTTPException(
             status_code=404,
             detail="data/patients.jsonl not found. Please add data/patients.jsonl to the project."
         )
-    patients = []
     try:
-        with open(patients_path, "r", encoding="utf-8") as f:
-            for line in f:
-                line = line.strip()
-                if line:
-                    patients.append(json.loads(line))
+        payload = _load_patients_payload(patients_path)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to read patients file: {str(e)}")
-    return patients
+    return Response(content=payload, media_type="application/json")
+
+
+# Health payload cache: avoids re-reading the manifest on every liveness probe
+_HEALTH_CACHE = {"ts": 0.0, "payload": None}
+HEALTH_CACHE_TTL_S = 2.0
 
 
 @app.get("/healthz")
 async def healthz():
     """Health check endpoint."""
+    now = time.monotonic()
+    if _HEALTH_CACHE["payload"] is not None and now - _HEALTH_CACHE["ts"] < HEALTH_CACHE_TTL_S:
+        return _HEALTH_CACHE["payload"]
+    
     # Get current build ID
     layout = ensure_store_layout(settings.RAG_STORE_ROOT)
     manifest = load_manifest(layout["manifest_path"])
@@ -94,23 +146,28 @@ async def healthz():
     except Exception as e:
         backend_name = f"error: {str(e)}"
     
-    return {
+    payload = {
         "status": "ok",
         "rag_current_build_id": current_build_id,
         "llm_backend": backend_name
     }
+    _HEALTH_CACHE["ts"] = now
+    _HEALTH_CACHE["payload"] = payload
+    return payload
 
 
-@app.post("/eras/evaluate", response_model=ERASResponse)
+@app.post("/eras/evaluate", responses={200: {"model": ERASResponse}})
 async def evaluate(req: ERASRequest):
     """
     Evaluate patient using ERAS CDSS.
     
     Returns ERASResponse with recommendation, actions, citations, etc.
+    run_decision already builds a response-shaped dict, so it is serialized
+    directly without another validation pass.
     """
     try:
         result = await run_decision(req)
-        return ERASResponse(**result)
+        return ORJSONResponse(content=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal error: {str(e)}")
 
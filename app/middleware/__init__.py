@@ -0,0 +1,4 @@
+"""Pure ASGI middleware."""
+from app.middleware.cors_asgi import ASGICors, ASGITimingMiddleware
+
+__all__ = ["ASGICors", "ASGITimingMiddleware"]
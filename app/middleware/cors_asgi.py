@@ -0,0 +1,111 @@
+"""Pure ASGI middleware for CORS and request timing.
+
+These wrap the raw ASGI callable directly, so no Request/Response objects
+are built per hop on the /eras/evaluate path.
+"""
+import time
+from typing import Any, Awaitable, Callable, MutableMapping
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+ALLOW_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+MAX_AGE = b"600"
+
+# Pre-baked preflight headers; allow-origin is the echoed request Origin
+_PREFLIGHT_HEADERS = (
+    (b"vary", b"Origin, Access-Control-Request-Method, Access-Control-Request-Headers"),
+    (b"access-control-allow-methods", ALLOW_METHODS),
+    (b"access-control-max-age", MAX_AGE),
+    (b"access-control-allow-credentials", b"true"),
+    (b"content-length", b"0"),
+)
+_CREDENTIALS_HEADER = (b"access-control-allow-credentials", b"true")
+
+
+def _get_header(scope: Scope, name: bytes) -> bytes:
+    """Return first matching raw header value from scope (empty if absent)."""
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value
+    return b""
+
+
+def _add_vary_origin(headers: list) -> None:
+    """Append Origin to an existing Vary header, or add one."""
+    for i, (key, value) in enumerate(headers):
+        if key.lower() == b"vary":
+            headers[i] = (key, value + b", Origin")
+            return
+    headers.append((b"vary", b"Origin"))
+
+
+class ASGICors:
+    """
+    CORS middleware allowing any origin with credentials, implemented as raw ASGI.
+    
+    Matches the previous CORSMiddleware(allow_origins=["*"], allow_credentials=True):
+    the request Origin is echoed (never "*", which browsers reject for
+    credentialed requests) with Access-Control-Allow-Credentials: true, and
+    requests without an Origin header get no CORS headers.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = _get_header(scope, b"origin")
+
+        # Preflight: answer directly without calling downstream
+        if origin and scope["method"] == "OPTIONS" and _get_header(scope, b"access-control-request-method"):
+            headers = [(b"access-control-allow-origin", origin), *_PREFLIGHT_HEADERS]
+            requested_headers = _get_header(scope, b"access-control-request-headers")
+            if requested_headers:
+                headers.append((b"access-control-allow-headers", requested_headers))
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def send_with_cors(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                if origin and not any(key.lower() == b"access-control-allow-origin" for key, _ in headers):
+                    headers.append((b"access-control-allow-origin", origin))
+                    headers.append(_CREDENTIALS_HEADER)
+                _add_vary_origin(headers)
+                message["headers"] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+class ASGITimingMiddleware:
+    """Adds an x-response-time header (ms until response start)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                message["headers"] = [
+                    *message.get("headers", ()),
+                    (b"x-response-time", f"{elapsed_ms:.2f}ms".encode()),
+                ]
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
@@ -1,17 +1,21 @@
 """Citation validation and repair logic."""
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Tuple, FrozenSet, Optional
+import orjson
+
+# Evidence excerpt length per hit in the citation patch prompt
+PATCH_EXCERPT_CHARS = 100
 
 
 def validate_citations(
     citations: List[Dict[str, str]],
-    hits: List[Dict[str, Any]]
+    valid_pairs: FrozenSet[Tuple[str, str]]
 ) -> Tuple[bool, List[str]]:
     """
     Validate that citations reference valid hits.
     
     Args:
         citations: List of citation dicts with 'source' and 'chunk_id'
-        hits: List of retrieval hits with 'source' and 'chunk_id'
+        valid_pairs: Set of valid (source, chunk_id) pairs from retrieval hits
         
     Returns:
         (ok, errors) - ok is True if all citations are valid
@@ -19,9 +23,6 @@ def validate_citations(
     if not citations:
         return False, ["At least one citation is required"]
     
-    # Build set of valid (source, chunk_id) pairs
-    valid_pairs = {(hit["source"], hit["chunk_id"]) for hit in hits}
-    
     errors = []
     for i, cit in enumerate(citations):
         if "source" not in cit or "chunk_id" not in cit:
@@ -39,45 +40,98 @@ def validate_citations(
     return ok, errors
 
 
+def _valid_pairs_json(valid_pairs: FrozenSet[Tuple[str, str]]) -> str:
+    """Serialize valid pairs as a compact, stably ordered JSON array."""
+    return orjson.dumps(
+        [{"source": source, "chunk_id": chunk_id} for source, chunk_id in sorted(valid_pairs)]
+    ).decode()
+
+
 def build_repair_prompt(
     original_task: str,
-    hits: List[Dict[str, Any]],
+    valid_pairs: FrozenSet[Tuple[str, str]],
     schema_json: str
 ) -> str:
     """
     Build repair prompt for S2 retry.
     
+    The evidence text is already part of the original task, so only the
+    valid (source, chunk_id) pairs are listed here.
+    
     Args:
         original_task: Original task prompt
-        hits: Available retrieval hits
+        valid_pairs: Valid (source, chunk_id) pairs from retrieval hits
         schema_json: JSON schema string
         
     Returns:
         Repair prompt string
     """
-    # Format hits list
-    hits_list = []
-    for i, hit in enumerate(hits):
-        hits_list.append(
-            f"  {i+1}. source={hit['source']}, chunk_id={hit['chunk_id']}, "
-            f"text={hit['text'][:100]}..."
-        )
-    hits_text = "\n".join(hits_list)
+    valid_pairs_json = _valid_pairs_json(valid_pairs)
     
-    repair_prompt = f"""Your previous response did not meet the requirements. Please fix it.
+    repair_prompt = f"""{original_task}
 
-REQUIREMENTS:
-1. Output must be valid JSON matching this schema:
+Your previous response did not meet the requirements. Fix it:
+1. Output only valid JSON matching this schema:
 {schema_json}
 
-2. You MUST include at least one citation from the following available hits:
+2. Include at least one citation. Each citation must be exactly one of these {{source, chunk_id}} pairs:
+{valid_pairs_json}"""
+    
+    return repair_prompt
+
+
+def build_citation_patch_prompt(
+    recommendation: str,
+    hits: List[Dict[str, Any]]
+) -> str:
+    """
+    Build a short prompt asking only for a corrected citations array.
+    
+    Used when the decision parsed fine but its citations were invalid, so
+    the rest of the decision is kept and only the citations are replaced.
+    Each hit is listed with a short excerpt so citations are chosen by
+    content, not by file name.
+    
+    Args:
+        recommendation: Recommendation text of the parsed decision
+        hits: Retrieval hits (source, chunk_id, text) the citations must come from
+        
+    Returns:
+        Citation patch prompt string
+    """
+    hits_text = "\n".join(
+        f"  {i+1}. source={hit['source']}, chunk_id={hit['chunk_id']}, "
+        f"text={hit['text'][:PATCH_EXCERPT_CHARS]}..."
+        for i, hit in enumerate(hits)
+    )
+    return f"""RECOMMENDATION: {recommendation[:300]}
+
+Select the evidence that supports this recommendation from these hits:
 {hits_text}
 
-3. Each citation must have both "source" and "chunk_id" matching exactly one of the hits above.
+Output only a JSON array of at least one {{"source": ..., "chunk_id": ...}} object, with values copied exactly from the hits above, no additional text."""
 
-ORIGINAL TASK:
-{original_task}
 
-Please provide a corrected response that follows the schema and uses valid citations from the hits list above."""
+def parse_citation_patch(raw: str) -> Tuple[Optional[List[Dict[str, str]]], Optional[str]]:
+    """
+    Parse the citations array returned for a citation patch prompt.
     
-    return repair_prompt
+    Returns:
+        (citations, error_message) - error_message is None if successful
+    """
+    start = raw.find("[")
+    end = raw.rfind("]")
+    if start == -1 or end < start:
+        return None, "No JSON array found in response"
+    try:
+        data = orjson.loads(raw[start:end + 1])
+    except orjson.JSONDecodeError as e:
+        return None, f"JSON decode error: {str(e)}"
+    
+    citations = []
+    for item in data:
+        if not isinstance(item, dict) or not isinstance(item.get("source"), str) \
+                or not isinstance(item.get("chunk_id"), str):
+            return None, f"Invalid citation entry: {item}"
+        citations.append({"source": item["source"], "chunk_id": item["chunk_id"]})
+    return citations, None
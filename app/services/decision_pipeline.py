@@ -1,22 +1,42 @@
 """Decision pipeline integrating all components."""
 import asyncio
+import sys
 import time
-import json
-from typing import Dict, Any, List
+from dataclasses import asdict
+import orjson
+from typing import Dict, Any, List, FrozenSet, Tuple, Optional
 from app.schemas import ERASRequest, ERASResponse, Citation
 from app.services.scenario_router import infer_scenario, Scenario
 from app.services.input_validator import validate_inputs
-from app.services.retriever_hybrid import HybridRetriever
+from app.services.retriever_hybrid import HybridRetriever, get_retriever
 from app.services.retrieval_postproc import filter_and_dedupe_hits, format_hits_context
 from app.services.schema_guard import parse_agent_decision, parse_arbiter_decision, AgentDecision, ArbiterDecision
-from app.services.citation_guard import validate_citations, build_repair_prompt
+from app.services.citation_guard import (
+    validate_citations, build_repair_prompt, build_citation_patch_prompt, parse_citation_patch
+)
+from app.services.prompt_budget import compact_fhir, compact_agent_decisions
 from app.services.llm.factory import get_llm_backend
 from app.services.llm.base import LLMGenConfig
 from app.services.trace_logger import trace_logger, new_trace_id
+from app.config import settings
 
 
-# Agent schemas as JSON strings
-AGENT_SCHEMA_JSON = json.dumps({
+def _request_summary(req: ERASRequest) -> Dict[str, Any]:
+    """Trace summary of the request (patient data is stored separately by digest)."""
+    return {
+        "question": req.question,
+        "top_k": req.top_k,
+        "scenario": req.scenario
+    }
+
+
+def _dumps(obj: Any) -> str:
+    """Serialize to indented JSON string (orjson)."""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+
+
+# Agent/arbiter JSON schemas (dicts for guided decoding, strings for prompts)
+AGENT_SCHEMA = {
     "type": "object",
     "properties": {
         "recommendation": {"type": "string"},
@@ -36,9 +56,9 @@ AGENT_SCHEMA_JSON = json.dumps({
         }
     },
     "required": ["recommendation", "citations"]
-}, indent=2)
+}
 
-ARBITER_SCHEMA_JSON = json.dumps({
+ARBITER_SCHEMA = {
     "type": "object",
     "properties": {
         "final_recommendation": {"type": "string"},
@@ -59,24 +79,64 @@ ARBITER_SCHEMA_JSON = json.dumps({
         }
     },
     "required": ["final_recommendation", "citations"]
-}, indent=2)
+}
 
+# Citation patch replies are a short JSON array (see LLM_CITATION_PATCH_MAX_TOKENS)
+CITATION_PATCH_CONFIG = LLMGenConfig(temperature=0.2, max_tokens=settings.LLM_CITATION_PATCH_MAX_TOKENS)
 
-def build_agent_prompt(
-    agent_name: str,
+AGENT_SCHEMA_JSON = _dumps(AGENT_SCHEMA)
+ARBITER_SCHEMA_JSON = _dumps(ARBITER_SCHEMA)
+
+
+def constrain_citations(
+    schema: Dict[str, Any],
+    valid_pairs: FrozenSet[Tuple[str, str]]
+) -> Dict[str, Any]:
+    """
+    Copy schema with each citation restricted to one retrieved (source, chunk_id) pair.
+    
+    Pairs are constrained together (anyOf over const objects), so a source can
+    not be combined with another document's chunk_id. valid_pairs must be non-empty.
+    """
+    citations = schema["properties"]["citations"]
+    return {
+        **schema,
+        "properties": {
+            **schema["properties"],
+            "citations": {
+                **citations,
+                "minItems": 1,
+                "items": {
+                    "anyOf": [
+                        {
+                            "type": "object",
+                            "properties": {
+                                "source": {"const": source},
+                                "chunk_id": {"const": chunk_id}
+                            },
+                            "required": ["source", "chunk_id"]
+                        }
+                        for source, chunk_id in sorted(valid_pairs)
+                    ]
+                }
+            }
+        }
+    }
+
+
+def _build_agent_prompt_common(
     scenario: Scenario,
     question: str,
-    patient_fhir: Dict[str, Any],
+    patient_json: str,
     hits_context: str
 ) -> str:
-    """Build prompt for agent."""
-    prompt = f"""You are a {agent_name} providing clinical decision support for ERAS (Enhanced Recovery After Surgery).
-
+    """Build the agent-independent part of the agent prompt (built once per request)."""
+    return f"""
 SCENARIO: {scenario.value}
 CLINICAL QUESTION: {question}
 
 PATIENT DATA:
-{json.dumps(patient_fhir, indent=2)}
+{patient_json}
 
 EVIDENCE CONTEXT:
 {hits_context}
@@ -91,20 +151,29 @@ Analyze the patient data and evidence to provide a recommendation. You MUST:
 3. Provide clear recommendation, actions, reasons, and risks.
 
 Output only the JSON object, no additional text."""
-    return prompt
+
+
+def build_agent_prompt(agent_name: str, common: str) -> str:
+    """Build prompt for agent from the shared prompt body."""
+    return (
+        f"You are a {agent_name} providing clinical decision support for ERAS "
+        f"(Enhanced Recovery After Surgery).\n" + common
+    )
 
 
 def build_arbiter_prompt(
     scenario: Scenario,
     question: str,
-    patient_fhir: Dict[str, Any],
+    patient_json: str,
     hits_context: str,
     agent_decisions: List[Dict[str, Any]]
 ) -> str:
-    """Build prompt for arbiter."""
+    """Build prompt for arbiter (patient_json is the pre-serialized patient data)."""
     agents_text = "\n".join([
-        f"\n[{i+1}] {agent['name']}:\n{json.dumps(agent['decision'], indent=2)}"
-        for i, agent in enumerate(agent_decisions)
+        f"\n[{i+1}] {agent['name']}:\n{orjson.dumps(agent['decision']).decode()}"
+        for i, agent in enumerate(
+            compact_agent_decisions(agent_decisions, max_items=settings.PROMPT_AGENT_MAX_ITEMS)
+        )
     ])
     
     prompt = f"""You are an ARBITER synthesizing multiple clinical expert opinions for ERAS decision support.
@@ -113,7 +182,7 @@ SCENARIO: {scenario.value}
 CLINICAL QUESTION: {question}
 
 PATIENT DATA:
-{json.dumps(patient_fhir, indent=2)}
+{patient_json}
 
 EVIDENCE CONTEXT:
 {hits_context}
@@ -136,270 +205,244 @@ Output only the JSON object, no additional text."""
     return prompt
 
 
+def _agent_fallback(recommendation: str, risk: str) -> Dict[str, Any]:
+    """Conservative agent decision used when no valid decision was produced."""
+    return {
+        "recommendation": recommendation,
+        "actions": [],
+        "reasons": [],
+        "risks": [risk],
+        "citations": []
+    }
+
+
+def _arbiter_fallback(recommendation: str, risk: str) -> Dict[str, Any]:
+    """Conservative arbiter decision used when no valid decision was produced."""
+    return {
+        "final_recommendation": recommendation,
+        "final_actions": [],
+        "key_reasons": [],
+        "risks_and_notes": [risk],
+        "conflicts": [],
+        "citations": []
+    }
+
+
 async def generate_agent_decision(
     agent_name: str,
     prompt: str,
+    valid_pairs: FrozenSet[Tuple[str, str]],
     hits: List[Dict[str, Any]],
-    retry: bool = True
+    retry: bool = True,
+    guided_schema: Optional[Dict[str, Any]] = None
 ) -> tuple[Dict[str, Any], str]:
     """
     Generate agent decision with S2 repair if needed.
     
+    guided_schema, if given, is passed to the backend for constrained decoding.
+    hits (the post-processed retrieval hits) back the citation patch prompt.
+    
     Returns:
         (agent_dict, error_message) - error_message is None if successful
     """
     llm = get_llm_backend()
-    config = LLMGenConfig(temperature=0.2, max_tokens=900)
+    config = LLMGenConfig(temperature=0.2, max_tokens=900, json_schema=guided_schema)
+    
+    # AgentDecision once parsed, otherwise a fallback dict; dumped once at the end
+    decision = None
+    error = None  # stored on the agent dict
+    error_message = None  # returned to the caller
     
     # First attempt
     result = await llm.generate(prompt, config)
     
     if result.error:
-        return {
-            "name": agent_name,
-            "decision": {
-                "recommendation": f"Error: {result.error}",
-                "actions": [],
-                "reasons": [],
-                "risks": [f"LLM error: {result.error}"],
-                "citations": []
-            },
-            "error": result.error
-        }, result.error
-    
-    # Parse decision
-    decision, parse_error = parse_agent_decision(result.text)
-    
-    if decision is None:
-        if not retry:
-            # Return conservative decision
-            return {
-                "name": agent_name,
-                "decision": {
-                    "recommendation": "Unable to parse decision. Manual review required.",
-                    "actions": [],
-                    "reasons": [],
-                    "risks": [f"Parse error: {parse_error}"],
-                    "citations": []
-                },
-                "error": parse_error
-            }, parse_error
+        decision = _agent_fallback(f"Error: {result.error}", f"LLM error: {result.error}")
+        error = error_message = result.error
+    else:
+        # Parse decision
+        decision, parse_error = parse_agent_decision(result.text)
         
-        # S2: Repair and retry
-        repair_prompt = build_repair_prompt(prompt, hits, AGENT_SCHEMA_JSON)
-        result2 = await llm.generate(repair_prompt, config)
+        if decision is None and not retry:
+            decision = _agent_fallback(
+                "Unable to parse decision. Manual review required.",
+                f"Parse error: {parse_error}"
+            )
+            error = error_message = parse_error
+        elif decision is None:
+            # S2: Repair and retry
+            repair_prompt = build_repair_prompt(prompt, valid_pairs, AGENT_SCHEMA_JSON)
+            result2 = await llm.generate(repair_prompt, config)
+            
+            if result2.error:
+                decision = _agent_fallback(
+                    f"Error on retry: {result2.error}",
+                    f"LLM error (retry): {result2.error}"
+                )
+                error = error_message = result2.error
+            else:
+                decision, parse_error2 = parse_agent_decision(result2.text)
+                if decision is None:
+                    decision = _agent_fallback(
+                        "Unable to parse decision after repair. Manual review required.",
+                        f"Parse error (retry): {parse_error2}"
+                    )
+                    error = error_message = parse_error2
+    
+    if isinstance(decision, AgentDecision):
+        # Validate citations
+        citations = [{"source": c["source"], "chunk_id": c["chunk_id"]} for c in decision.citations]
+        cit_ok, cit_errors = validate_citations(citations, valid_pairs)
         
-        if result2.error:
-            return {
-                "name": agent_name,
-                "decision": {
-                    "recommendation": f"Error on retry: {result2.error}",
-                    "actions": [],
-                    "reasons": [],
-                    "risks": [f"LLM error (retry): {result2.error}"],
-                    "citations": []
-                },
-                "error": result2.error
-            }, result2.error
-        
-        decision, parse_error2 = parse_agent_decision(result2.text)
-        if decision is None:
-            return {
-                "name": agent_name,
-                "decision": {
-                    "recommendation": "Unable to parse decision after repair. Manual review required.",
-                    "actions": [],
-                    "reasons": [],
-                    "risks": [f"Parse error (retry): {parse_error2}"],
-                    "citations": []
-                },
-                "error": parse_error2
-            }, parse_error2
-    
-    # Validate citations
-    citations = [{"source": c["source"], "chunk_id": c["chunk_id"]} for c in decision.citations]
-    cit_ok, cit_errors = validate_citations(citations, hits)
-    
-    if not cit_ok:
-        if not retry:
+        if not cit_ok and not retry:
             # Return with invalid citations (but still return decision)
-            return {
-                "name": agent_name,
-                "decision": decision.dict(),
-                "error": f"Citation validation failed: {', '.join(cit_errors)}"
-            }, f"Citation errors: {', '.join(cit_errors)}"
-        
-        # S2: Repair citations
-        repair_prompt = build_repair_prompt(prompt, hits, AGENT_SCHEMA_JSON)
-        result2 = await llm.generate(repair_prompt, config)
-        
-        if result2.error:
-            return {
-                "name": agent_name,
-                "decision": decision.dict(),
-                "error": f"Citation repair failed: {result2.error}"
-            }, result2.error
-        
-        decision2, parse_error2 = parse_agent_decision(result2.text)
-        if decision2 is None:
-            return {
-                "name": agent_name,
-                "decision": decision.dict(),
-                "error": f"Citation repair parse failed: {parse_error2}"
-            }, parse_error2
+            error = f"Citation validation failed: {', '.join(cit_errors)}"
+            error_message = f"Citation errors: {', '.join(cit_errors)}"
+        elif not cit_ok:
+            # S2: Repair citations only (the rest of the decision parsed fine)
+            patch_prompt = build_citation_patch_prompt(decision.recommendation, hits)
+            result2 = await llm.generate(patch_prompt, CITATION_PATCH_CONFIG)
+            
+            if result2.error:
+                error = f"Citation repair failed: {result2.error}"
+                error_message = result2.error
+            else:
+                citations2, patch_error = parse_citation_patch(result2.text)
+                if citations2 is None:
+                    error = f"Citation repair parse failed: {patch_error}"
+                    error_message = patch_error
+                else:
+                    cit_ok2, cit_errors2 = validate_citations(citations2, valid_pairs)
+                    if not cit_ok2:
+                        error = f"Citation validation still failed: {', '.join(cit_errors2)}"
+                        error_message = f"Citation errors (retry): {', '.join(cit_errors2)}"
+                    decision.citations = citations2
         
-        citations2 = [{"source": c["source"], "chunk_id": c["chunk_id"]} for c in decision2.citations]
-        cit_ok2, cit_errors2 = validate_citations(citations2, hits)
-        if not cit_ok2:
-            return {
-                "name": agent_name,
-                "decision": decision2.dict(),
-                "error": f"Citation validation still failed: {', '.join(cit_errors2)}"
-            }, f"Citation errors (retry): {', '.join(cit_errors2)}"
-        
-        decision = decision2
+        decision = decision.model_dump(mode="python")
     
     return {
         "name": agent_name,
-        "decision": decision.dict(),
-        "error": None
-    }, None
+        "decision": decision,
+        "error": error
+    }, error_message
 
 
 async def generate_arbiter_decision(
     prompt: str,
+    valid_pairs: FrozenSet[Tuple[str, str]],
     hits: List[Dict[str, Any]],
-    retry: bool = True
+    retry: bool = True,
+    guided_schema: Optional[Dict[str, Any]] = None
 ) -> tuple[Dict[str, Any], str]:
     """
     Generate arbiter decision with S2 repair if needed.
     
+    guided_schema, if given, is passed to the backend for constrained decoding.
+    hits (the post-processed retrieval hits) back the citation patch prompt.
+    
     Returns:
         (arbiter_dict, error_message) - error_message is None if successful
     """
     llm = get_llm_backend()
-    config = LLMGenConfig(temperature=0.2, max_tokens=900)
+    config = LLMGenConfig(temperature=0.2, max_tokens=900, json_schema=guided_schema)
+    
+    # ArbiterDecision once parsed, otherwise a fallback dict; dumped once at the end
+    decision = None
+    error = None  # stored on the arbiter dict
+    error_message = None  # returned to the caller
     
     # First attempt
     result = await llm.generate(prompt, config)
     
     if result.error:
-        return {
-            "decision": {
-                "final_recommendation": f"Error: {result.error}",
-                "final_actions": [],
-                "key_reasons": [],
-                "risks_and_notes": [f"LLM error: {result.error}"],
-                "conflicts": [],
-                "citations": []
-            },
-            "error": result.error
-        }, result.error
-    
-    # Parse decision
-    decision, parse_error = parse_arbiter_decision(result.text)
-    
-    if decision is None:
-        if not retry:
-            return {
-                "decision": {
-                    "final_recommendation": "Unable to parse arbiter decision. Manual review required.",
-                    "final_actions": [],
-                    "key_reasons": [],
-                    "risks_and_notes": [f"Parse error: {parse_error}"],
-                    "conflicts": [],
-                    "citations": []
-                },
-                "error": parse_error
-            }, parse_error
-        
-        # S2: Repair and retry
-        repair_prompt = build_repair_prompt(prompt, hits, ARBITER_SCHEMA_JSON)
-        result2 = await llm.generate(repair_prompt, config)
-        
-        if result2.error:
-            return {
-                "decision": {
-                    "final_recommendation": f"Error on retry: {result2.error}",
-                    "final_actions": [],
-                    "key_reasons": [],
-                    "risks_and_notes": [f"LLM error (retry): {result2.error}"],
-                    "conflicts": [],
-                    "citations": []
-                },
-                "error": result2.error
-            }, result2.error
-        
-        decision, parse_error2 = parse_arbiter_decision(result2.text)
-        if decision is None:
-            return {
-                "decision": {
-                    "final_recommendation": "Unable to parse arbiter decision after repair. Manual review required.",
-                    "final_actions": [],
-                    "key_reasons": [],
-                    "risks_and_notes": [f"Parse error (retry): {parse_error2}"],
-                    "conflicts": [],
-                    "citations": []
-                },
-                "error": parse_error2
-            }, parse_error2
-    
-    # Validate citations
-    citations = [{"source": c["source"], "chunk_id": c["chunk_id"]} for c in decision.citations]
-    cit_ok, cit_errors = validate_citations(citations, hits)
-    
-    if not cit_ok:
-        if not retry:
-            return {
-                "decision": decision.dict(),
-                "error": f"Citation validation failed: {', '.join(cit_errors)}"
-            }, f"Citation errors: {', '.join(cit_errors)}"
-        
-        # S2: Repair citations
-        repair_prompt = build_repair_prompt(prompt, hits, ARBITER_SCHEMA_JSON)
-        result2 = await llm.generate(repair_prompt, config)
-        
-        if result2.error:
-            return {
-                "decision": decision.dict(),
-                "error": f"Citation repair failed: {result2.error}"
-            }, result2.error
+        decision = _arbiter_fallback(f"Error: {result.error}", f"LLM error: {result.error}")
+        error = error_message = result.error
+    else:
+        # Parse decision
+        decision, parse_error = parse_arbiter_decision(result.text)
         
-        decision2, parse_error2 = parse_arbiter_decision(result2.text)
-        if decision2 is None:
-            return {
-                "decision": decision.dict(),
-                "error": f"Citation repair parse failed: {parse_error2}"
-            }, parse_error2
+        if decision is None and not retry:
+            decision = _arbiter_fallback(
+                "Unable to parse arbiter decision. Manual review required.",
+                f"Parse error: {parse_error}"
+            )
+            error = error_message = parse_error
+        elif decision is None:
+            # S2: Repair and retry
+            repair_prompt = build_repair_prompt(prompt, valid_pairs, ARBITER_SCHEMA_JSON)
+            result2 = await llm.generate(repair_prompt, config)
+            
+            if result2.error:
+                decision = _arbiter_fallback(
+                    f"Error on retry: {result2.error}",
+                    f"LLM error (retry): {result2.error}"
+                )
+                error = error_message = result2.error
+            else:
+                decision, parse_error2 = parse_arbiter_decision(result2.text)
+                if decision is None:
+                    decision = _arbiter_fallback(
+                        "Unable to parse arbiter decision after repair. Manual review required.",
+                        f"Parse error (retry): {parse_error2}"
+                    )
+                    error = error_message = parse_error2
+    
+    if isinstance(decision, ArbiterDecision):
+        # Validate citations
+        citations = [{"source": c["source"], "chunk_id": c["chunk_id"]} for c in decision.citations]
+        cit_ok, cit_errors = validate_citations(citations, valid_pairs)
         
-        citations2 = [{"source": c["source"], "chunk_id": c["chunk_id"]} for c in decision2.citations]
-        cit_ok2, cit_errors2 = validate_citations(citations2, hits)
-        if not cit_ok2:
-            return {
-                "decision": decision2.dict(),
-                "error": f"Citation validation still failed: {', '.join(cit_errors2)}"
-            }, f"Citation errors (retry): {', '.join(cit_errors2)}"
+        if not cit_ok and not retry:
+            error = f"Citation validation failed: {', '.join(cit_errors)}"
+            error_message = f"Citation errors: {', '.join(cit_errors)}"
+        elif not cit_ok:
+            # S2: Repair citations only (the rest of the decision parsed fine)
+            patch_prompt = build_citation_patch_prompt(decision.final_recommendation, hits)
+            result2 = await llm.generate(patch_prompt, CITATION_PATCH_CONFIG)
+            
+            if result2.error:
+                error = f"Citation repair failed: {result2.error}"
+                error_message = result2.error
+            else:
+                citations2, patch_error = parse_citation_patch(result2.text)
+                if citations2 is None:
+                    error = f"Citation repair parse failed: {patch_error}"
+                    error_message = patch_error
+                else:
+                    cit_ok2, cit_errors2 = validate_citations(citations2, valid_pairs)
+                    if not cit_ok2:
+                        error = f"Citation validation still failed: {', '.join(cit_errors2)}"
+                        error_message = f"Citation errors (retry): {', '.join(cit_errors2)}"
+                    decision.citations = citations2
         
-        decision = decision2
+        decision = decision.model_dump(mode="python")
     
     return {
-        "decision": decision.dict(),
-        "error": None
-    }, None
+        "decision": decision,
+        "error": error
+    }, error_message
 
 
-async def run_decision(req: ERASRequest) -> Dict[str, Any]:
+async def run_decision(
+    req: ERASRequest,
+    retriever: Optional[HybridRetriever] = None
+) -> Dict[str, Any]:
     """
     Run decision pipeline.
     
+    Args:
+        req: Evaluation request
+        retriever: Retriever to use (defaults to the shared get_retriever() instance)
+    
     Returns:
         Dict matching ERASResponse schema
     """
     start_time = time.time()
     trace_id = new_trace_id()
     
-    # Initialize retriever
-    retriever = HybridRetriever()
+    # Shared retriever (index loaded once, not per request)
+    if retriever is None:
+        retriever = get_retriever()
     
     # Step 1: Infer scenario
     scenario = infer_scenario(req.scenario, req.question, req.patient_fhir)
@@ -427,12 +470,12 @@ async def run_decision(req: ERASRequest) -> Dict[str, Any]:
         }
         
         # Trace
-        trace_logger.write(trace_id, {
-            "request": req.dict(),
+        trace_logger.submit(trace_id, {
+            "request_summary": _request_summary(req),
             "scenario": scenario.value,
-            "validation": validation.dict(),
-            "response": response
-        })
+            "validation": asdict(validation),
+            "response": dict(response)
+        }, patient_fhir=req.patient_fhir)
         
         return response
     
@@ -459,28 +502,45 @@ async def run_decision(req: ERASRequest) -> Dict[str, Any]:
             }
         }
         
-        trace_logger.write(trace_id, {
-            "request": req.dict(),
+        trace_logger.submit(trace_id, {
+            "request_summary": _request_summary(req),
             "scenario": scenario.value,
             "hits": [],
-            "response": response
-        })
+            "response": dict(response)
+        }, patient_fhir=req.patient_fhir)
         
         return response
     
     # Step 4: Post-process hits
     hits = filter_and_dedupe_hits(hits, min_chars=120, per_source_cap=3)
+    # Intern citation keys: hash is cached and equality is an identity check
+    for h in hits:
+        h["source"] = sys.intern(h["source"])
+        h["chunk_id"] = sys.intern(h["chunk_id"])
     hits_context = format_hits_context(hits)
+    # (source, chunk_id) -> hit; keys double as the valid citation pairs
+    hit_index = {(h["source"], h["chunk_id"]): h for h in hits}
+    valid_pairs = frozenset(hit_index)
+    patient_json = compact_fhir(req.patient_fhir, max_chars=settings.PROMPT_FHIR_MAX_CHARS)
     
     # Step 5: Generate agent decisions in parallel
     agent_names = ["SURGEON", "ANESTHESIOLOGIST", "NURSE"]
-    agent_prompts = [
-        build_agent_prompt(name, scenario, req.question, req.patient_fhir, hits_context)
-        for name in agent_names
-    ]
-    
+    agent_prompt_common = _build_agent_prompt_common(
+        scenario, req.question, patient_json, hits_context
+    )
+    agent_prompts = [build_agent_prompt(name, agent_prompt_common) for name in agent_names]
+    
+    # Constrained decoding yields schema-valid JSON with in-set citations, so S2 repair is
+    # skipped; only when the backend enforces the schema and there are pairs to allow
+    guided = (
+        settings.LLM_GUIDED_DECODING
+        and get_llm_backend().supports_json_schema
+        and bool(valid_pairs)
+    )
+    retry = not guided
+    agent_schema = constrain_citations(AGENT_SCHEMA, valid_pairs) if guided else None
     agent_tasks = [
-        generate_agent_decision(name, prompt, hits, retry=True)
+        generate_agent_decision(name, prompt, valid_pairs, hits, retry=retry, guided_schema=agent_schema)
         for name, prompt in zip(agent_names, agent_prompts)
     ]
     
@@ -490,9 +550,12 @@ async def run_decision(req: ERASRequest) -> Dict[str, Any]:
     
     # Step 6: Generate arbiter decision
     arbiter_prompt = build_arbiter_prompt(
-        scenario, req.question, req.patient_fhir, hits_context, agent_decisions
+        scenario, req.question, patient_json, hits_context, agent_decisions
+    )
+    arbiter_result, arbiter_error = await generate_arbiter_decision(
+        arbiter_prompt, valid_pairs, hits, retry=retry,
+        guided_schema=constrain_citations(ARBITER_SCHEMA, valid_pairs) if guided else None
     )
-    arbiter_result, arbiter_error = await generate_arbiter_decision(arbiter_prompt, hits, retry=True)
     
     # Step 7: Build response
     arbiter_decision = arbiter_result["decision"]
@@ -501,10 +564,7 @@ async def run_decision(req: ERASRequest) -> Dict[str, Any]:
     citations_with_text = []
     for cit in arbiter_decision.get("citations", []):
         # Find matching hit
-        matching_hit = next(
-            (h for h in hits if h["source"] == cit["source"] and h["chunk_id"] == cit["chunk_id"]),
-            None
-        )
+        matching_hit = hit_index.get((cit["source"], cit["chunk_id"]))
         if matching_hit:
             citations_with_text.append(Citation(
                 source=cit["source"],
@@ -554,13 +614,13 @@ async def run_decision(req: ERASRequest) -> Dict[str, Any]:
     }
     
     # Step 8: Trace
-    trace_logger.write(trace_id, {
-        "request": req.dict(),
+    trace_logger.submit(trace_id, {
+        "request_summary": _request_summary(req),
         "scenario": scenario.value,
         "hits": hits,
         "agents": agent_decisions,
         "arbiter": arbiter_result,
-        "response": response
-    })
+        "response": dict(response)
+    }, patient_fhir=req.patient_fhir)
     
     return response
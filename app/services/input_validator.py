@@ -1,16 +1,136 @@
 """Input validation for patient data."""
+from dataclasses import dataclass
 from typing import Dict, Any, List
-from pydantic import BaseModel
 from .scenario_router import Scenario
 
 
-class ValidationResult(BaseModel):
+@dataclass(slots=True)
+class ValidationResult:
     """Validation result."""
     ok: bool
     missing: List[str]
     errors: List[str]
 
 
+# Sentinel for absent keys (a present None is still a value)
+_MISSING = object()
+
+# Nu-DESC items scored 0-2 (illusions checked separately, see _NU_DESC_ILLUSIONS_KEYS)
+_NU_DESC_ITEMS = (
+    "disorientation",
+    "inappropriate_behavior",
+    "inappropriate_communication",
+    "psychomotor_retardation"
+)
+# Support both "illusions" and "illusions_hallucinations" for backward compatibility
+_NU_DESC_ILLUSIONS_KEYS = ("illusions_hallucinations", "illusions")
+
+# Chest tube removal fields (non-digital chest tube)
+_CHEST_TUBE_FIELDS = (
+    ("air_leak_present", bool),
+    ("drain_output_ml_24h", int),
+    ("fluid_quality", str),  # serous/serosanguineous/bloody/other
+    ("active_bleeding_suspected", bool),
+    ("lung_expanded", bool),
+    ("threshold_ml_24h", int)  # default 450
+)
+_CHEST_TUBE_THRESHOLD_DEFAULT = 450
+_FLUID_QUALITY = frozenset({"serous", "serosanguineous", "bloody", "other"})
+
+# PONV Koivuranta score fields (all bool except surgery_duration_min)
+_PONV_FIELDS = (
+    "female",
+    "non_smoker",
+    "hx_ponv",  # history of PONV
+    "hx_motion_sickness",  # history of motion sickness
+    "surgery_duration_min"
+)
+
+
+def _is_score(val: Any) -> bool:
+    """Nu-DESC item score: integer 0-2 (bool is not accepted)."""
+    return type(val) is int and 0 <= val <= 2
+
+
+def _is_non_negative_int(val: Any) -> bool:
+    """Non-negative integer (bool is not accepted)."""
+    return type(val) is int and val >= 0
+
+
+def _validate_pod(patient_fhir: Dict[str, Any], missing: List[str], errors: List[str]):
+    """POD requires Nu-DESC scores (each 0-2) and surgery_duration_min."""
+    nu_desc = patient_fhir.get("nu_desc", _MISSING)
+    if nu_desc is _MISSING:
+        missing.append("nu_desc")
+    elif not isinstance(nu_desc, dict):
+        errors.append("nu_desc must be a dictionary")
+    else:
+        for item in _NU_DESC_ITEMS:
+            score = nu_desc.get(item, _MISSING)
+            if score is _MISSING:
+                missing.append(f"nu_desc.{item}")
+            elif not _is_score(score):
+                errors.append(f"nu_desc.{item} must be integer 0-2, got {score}")
+        
+        # Check illusions/illusions_hallucinations
+        for illusions_key in _NU_DESC_ILLUSIONS_KEYS:
+            score = nu_desc.get(illusions_key, _MISSING)
+            if score is not _MISSING:
+                if not _is_score(score):
+                    errors.append(f"nu_desc.{illusions_key} must be integer 0-2, got {score}")
+                break
+        else:
+            missing.append("nu_desc.illusions_hallucinations (or nu_desc.illusions)")
+    
+    # Koivuranta requires surgery_duration_min
+    dur = patient_fhir.get("surgery_duration_min", _MISSING)
+    if dur is _MISSING:
+        missing.append("surgery_duration_min")
+    elif not _is_non_negative_int(dur):
+        errors.append(f"surgery_duration_min must be non-negative integer, got {dur}")
+
+
+def _validate_chest_tube(patient_fhir: Dict[str, Any], missing: List[str], errors: List[str]):
+    """Chest tube removal validation (non-digital chest tube)."""
+    for field, field_type in _CHEST_TUBE_FIELDS:
+        val = patient_fhir.get(field, _MISSING)
+        if val is _MISSING:
+            if field == "threshold_ml_24h":
+                # Set default if missing
+                patient_fhir[field] = _CHEST_TUBE_THRESHOLD_DEFAULT
+            else:
+                missing.append(field)
+        elif field_type is int:
+            if not _is_non_negative_int(val):
+                errors.append(f"{field} must be non-negative integer, got {val}")
+        elif type(val) is not field_type:
+            kind = "boolean" if field_type is bool else "string"
+            errors.append(f"{field} must be {kind}, got {val}")
+        elif field == "fluid_quality" and val not in _FLUID_QUALITY:
+            errors.append(f"{field} must be one of: serous, serosanguineous, bloody, other")
+
+
+def _validate_ponv(patient_fhir: Dict[str, Any], missing: List[str], errors: List[str]):
+    """PONV Koivuranta score validation."""
+    for field in _PONV_FIELDS:
+        val = patient_fhir.get(field, _MISSING)
+        if val is _MISSING:
+            missing.append(field)
+        elif field == "surgery_duration_min":
+            if not _is_non_negative_int(val):
+                errors.append(f"{field} must be non-negative integer, got {val}")
+        elif type(val) is not bool:
+            errors.append(f"{field} must be boolean, got {val}")
+
+
+# Per-scenario validators (scenarios without an entry need no inputs)
+_VALIDATORS = {
+    Scenario.POD: _validate_pod,
+    Scenario.CHEST_TUBE: _validate_chest_tube,
+    Scenario.PONV: _validate_ponv
+}
+
+
 def validate_inputs(
     scenario: Scenario,
     patient_fhir: Dict[str, Any]
@@ -28,100 +148,9 @@ def validate_inputs(
     missing = []
     errors = []
     
-    if scenario == Scenario.POD:
-        # POD requires Nu-DESC scores (each 0-2)
-        if "nu_desc" not in patient_fhir:
-            missing.append("nu_desc")
-        else:
-            nu_desc = patient_fhir["nu_desc"]
-            if not isinstance(nu_desc, dict):
-                errors.append("nu_desc must be a dictionary")
-            else:
-                required_items = ["disorientation", "inappropriate_behavior", 
-                                "inappropriate_communication", "psychomotor_retardation"]
-                # Support both "illusions" and "illusions_hallucinations" for backward compatibility
-                illusions_key = None
-                if "illusions_hallucinations" in nu_desc:
-                    illusions_key = "illusions_hallucinations"
-                elif "illusions" in nu_desc:
-                    illusions_key = "illusions"
-                
-                for item in required_items:
-                    if item not in nu_desc:
-                        missing.append(f"nu_desc.{item}")
-                    else:
-                        score = nu_desc[item]
-                        if not isinstance(score, int) or score < 0 or score > 2:
-                            errors.append(f"nu_desc.{item} must be integer 0-2, got {score}")
-                
-                # Check illusions/illusions_hallucinations
-                if illusions_key is None:
-                    missing.append("nu_desc.illusions_hallucinations (or nu_desc.illusions)")
-                else:
-                    score = nu_desc[illusions_key]
-                    if not isinstance(score, int) or score < 0 or score > 2:
-                        errors.append(f"nu_desc.{illusions_key} must be integer 0-2, got {score}")
-        
-        # Koivuranta requires surgery_duration_min
-        if "surgery_duration_min" not in patient_fhir:
-            missing.append("surgery_duration_min")
-        else:
-            dur = patient_fhir["surgery_duration_min"]
-            if not isinstance(dur, int) or dur < 0:
-                errors.append(f"surgery_duration_min must be non-negative integer, got {dur}")
-    
-    elif scenario == Scenario.CHEST_TUBE:
-        # Chest tube removal validation (non-digital chest tube)
-        required_fields = {
-            "air_leak_present": bool,
-            "drain_output_ml_24h": int,
-            "fluid_quality": str,  # serous/serosanguineous/bloody/other
-            "active_bleeding_suspected": bool,
-            "lung_expanded": bool,
-            "threshold_ml_24h": int  # default 450
-        }
-        
-        for field, field_type in required_fields.items():
-            if field not in patient_fhir:
-                if field == "threshold_ml_24h":
-                    # Set default if missing
-                    patient_fhir[field] = 450
-                else:
-                    missing.append(field)
-            else:
-                val = patient_fhir[field]
-                if field_type == int:
-                    if not isinstance(val, int) or val < 0:
-                        errors.append(f"{field} must be non-negative integer, got {val}")
-                elif field_type == bool:
-                    if not isinstance(val, bool):
-                        errors.append(f"{field} must be boolean, got {val}")
-                elif field_type == str:
-                    if not isinstance(val, str):
-                        errors.append(f"{field} must be string, got {val}")
-                    elif field == "fluid_quality" and val not in ["serous", "serosanguineous", "bloody", "other"]:
-                        errors.append(f"{field} must be one of: serous, serosanguineous, bloody, other")
-    
-    elif scenario == Scenario.PONV:
-        # PONV Koivuranta score validation
-        required_fields = [
-            "female",  # bool
-            "non_smoker",  # bool
-            "hx_ponv",  # bool (history of PONV)
-            "hx_motion_sickness",  # bool (history of motion sickness)
-            "surgery_duration_min"  # int
-        ]
-        for field in required_fields:
-            if field not in patient_fhir:
-                missing.append(field)
-            elif field == "surgery_duration_min":
-                val = patient_fhir[field]
-                if not isinstance(val, int) or val < 0:
-                    errors.append(f"{field} must be non-negative integer, got {val}")
-            else:
-                val = patient_fhir[field]
-                if not isinstance(val, bool):
-                    errors.append(f"{field} must be boolean, got {val}")
+    validator = _VALIDATORS.get(scenario)
+    if validator is not None:
+        validator(patient_fhir, missing, errors)
     
     ok = len(missing) == 0 and len(errors) == 0
     
@@ -1,16 +1,29 @@
 """Base LLM backend interface."""
 from abc import ABC, abstractmethod
-from pydantic import BaseModel
-from typing import Optional
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Tuple
+import asyncio
+import random
+import aiohttp
+import orjson
+from app.services.llm.session import get_shared_session, close_shared_session
 
+# Connection setup budget (seconds), separate from the generation timeout
+CONNECT_TIMEOUT_S = 5
+WARMUP_TIMEOUT = aiohttp.ClientTimeout(total=5)
 
-class LLMGenConfig(BaseModel):
+
+@dataclass(frozen=True, slots=True)
+class LLMGenConfig:
     """LLM generation configuration."""
     temperature: float = 0.2
     max_tokens: int = 900
+    # JSON schema for constrained decoding (None = unconstrained)
+    json_schema: Optional[Dict[str, Any]] = None
 
 
-class LLMResult(BaseModel):
+@dataclass(frozen=True, slots=True)
+class LLMResult:
     """LLM generation result."""
     text: str
     error: Optional[str] = None
@@ -19,11 +32,80 @@ class LLMResult(BaseModel):
 class BaseLLMBackend(ABC):
     """Base class for LLM backends."""
     
-    def __init__(self, name: str, base_url: str, model_id: str, timeout: int = 60):
+    # Whether generate() enforces LLMGenConfig.json_schema (constrained decoding)
+    supports_json_schema: bool = False
+    
+    def __init__(
+        self,
+        name: str,
+        base_url: str,
+        model_id: str,
+        timeout: int = 60,
+        session: Optional[aiohttp.ClientSession] = None
+    ):
         self.name = name
         self.base_url = base_url.rstrip("/")
         self.model_id = model_id
         self.timeout = timeout
+        # Built once; connect fails fast while reads may take the full timeout
+        self._timeout = aiohttp.ClientTimeout(
+            total=timeout,
+            sock_connect=min(CONNECT_TIMEOUT_S, timeout),
+            sock_read=timeout
+        )
+        # Injected session is owned (and closed) by the caller
+        self.session = session
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the injected session, or the process-wide pooled session."""
+        if self.session is not None and not self.session.closed:
+            return self.session
+        return get_shared_session()
+    
+    async def _post_with_retry(
+        self,
+        url: str,
+        payload: Dict[str, Any],
+        retries: int = 1,
+        backoff: float = 0.1
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        POST a JSON payload, retrying network errors with exponential backoff and jitter.
+        
+        Returns:
+            (data, error): decoded JSON body on HTTP 200, otherwise an error message
+        """
+        session = await self._get_session()
+        
+        for attempt in range(retries + 1):
+            suffix = " (retry)" if attempt else ""
+            try:
+                async with session.post(url, json=payload, timeout=self._timeout) as response:
+                    if response.status == 200:
+                        return orjson.loads(await response.read()), None
+                    error_text = await response.text()
+                    return None, f"HTTP {response.status}{suffix}: {error_text}"
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == retries:
+                    label = "Network error (retry failed)" if attempt else "Network error"
+                    return None, f"{label}: {str(e)}"
+                await asyncio.sleep(backoff * (2 ** attempt) + random.random() * 0.05)
+        
+        return None, "Network error: no attempts made"
+    
+    async def warmup(self):
+        """Open a keep-alive connection to the backend (best effort)."""
+        session = await self._get_session()
+        try:
+            async with session.get(self.base_url, timeout=WARMUP_TIMEOUT) as response:
+                await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+    
+    async def close(self):
+        """Close the shared pooled session (an injected session is left to its owner)."""
+        if self.session is None:
+            await close_shared_session()
     
     @abstractmethod
     async def generate(
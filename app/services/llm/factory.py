@@ -1,5 +1,6 @@
 """LLM backend factory."""
-from typing import Optional
+import threading
+from functools import lru_cache
 from app.config import settings
 from app.services.llm.base import BaseLLMBackend
 from app.services.llm.backends.ollama_backend import OllamaBackend
@@ -7,39 +8,38 @@ from app.services.llm.backends.vllm_backend import VLLMBackend
 from app.services.llm.backends.trtllm_backend import TRTLLMBackend
 
 
-# Singleton instance（若 MODEL_ID 變更會重建）
-_backend_instance: Optional[BaseLLMBackend] = None
-_backend_model_id: Optional[str] = None
+_BACKENDS = {
+    "ollama": OllamaBackend,
+    "vllm": VLLMBackend,
+    "trtllm": TRTLLMBackend
+}
+
+# Serializes first construction per key across threads
+_backend_lock = threading.RLock()
+
+
+@lru_cache(maxsize=8)
+def _make_backend(name: str, base_url: str, model_id: str, timeout: int) -> BaseLLMBackend:
+    """Build one backend per (name, base_url, model_id, timeout); all share the pooled session."""
+    backend_cls = _BACKENDS.get(name)
+    if backend_cls is None:
+        raise ValueError(f"Unknown LLM backend: {name}. Use: ollama, vllm, or trtllm")
+    return backend_cls(base_url, model_id, timeout)
 
 
 def get_llm_backend() -> BaseLLMBackend:
     """
-    Get LLM backend instance (singleton).
-    MODEL_ID 若為 llama2 會強制使用 gpt-oss:20b；若 MODEL_ID 變更會重建 backend。
+    Get LLM backend instance (cached per backend, base URL, model and timeout).
+    MODEL_ID 若為 llama2 會強制使用 gpt-oss:20b；設定變更時取用（或建立）對應的 backend，不會關閉既有連線。
     """
-    global _backend_instance, _backend_model_id
-    
     model_id = settings.MODEL_ID.strip()
     if model_id.lower() == "llama2":
         model_id = "gpt-oss:20b"
     
-    if _backend_instance is not None and _backend_model_id == model_id:
-        return _backend_instance
-    
-    _backend_instance = None
-    _backend_model_id = model_id
-    
-    backend_name = settings.LLM_BACKEND.lower()
-    base_url = settings.LLM_BASE_URL
-    timeout = settings.REQUEST_TIMEOUT_S
-    
-    if backend_name == "ollama":
-        _backend_instance = OllamaBackend(base_url, model_id, timeout)
-    elif backend_name == "vllm":
-        _backend_instance = VLLMBackend(base_url, model_id, timeout)
-    elif backend_name == "trtllm":
-        _backend_instance = TRTLLMBackend(base_url, model_id, timeout)
-    else:
-        raise ValueError(f"Unknown LLM backend: {backend_name}. Use: ollama, vllm, or trtllm")
-    
-    return _backend_instance
+    with _backend_lock:
+        return _make_backend(
+            settings.LLM_BACKEND.lower(),
+            settings.LLM_BASE_URL,
+            model_id,
+            settings.REQUEST_TIMEOUT_S
+        )
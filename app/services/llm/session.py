@@ -0,0 +1,44 @@
+"""Process-wide pooled aiohttp session shared by all LLM backends."""
+from typing import Any, Optional
+import aiohttp
+import orjson
+from app.config import settings
+
+# Connector tuning (seconds)
+DNS_CACHE_TTL_S = 300
+KEEPALIVE_TIMEOUT_S = 75
+
+_shared_session: Optional[aiohttp.ClientSession] = None
+
+
+def _json_serialize(obj: Any) -> str:
+    """aiohttp json= serializer (orjson; aiohttp expects str)."""
+    return orjson.dumps(obj).decode()
+
+
+def get_shared_session() -> aiohttp.ClientSession:
+    """
+    Get or create the shared session (keep-alive, capped connections).
+    Must be called from within the running event loop.
+    """
+    global _shared_session
+    if _shared_session is None or _shared_session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=settings.LLM_MAX_CONNECTIONS,
+            limit_per_host=settings.LLM_MAX_CONNECTIONS_PER_HOST,
+            ttl_dns_cache=DNS_CACHE_TTL_S,
+            keepalive_timeout=KEEPALIVE_TIMEOUT_S
+        )
+        _shared_session = aiohttp.ClientSession(
+            connector=connector,
+            json_serialize=_json_serialize
+        )
+    return _shared_session
+
+
+async def close_shared_session():
+    """Close the shared session (app shutdown)."""
+    global _shared_session
+    if _shared_session is not None and not _shared_session.closed:
+        await _shared_session.close()
+    _shared_session = None
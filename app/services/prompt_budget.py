@@ -0,0 +1,100 @@
+"""Prompt budgeting: compact serializers for patient data and agent decisions."""
+import logging
+from typing import Any, Dict, List
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Low-salience FHIR fields dropped from prompts (narrative, identifiers, metadata)
+FHIR_DENYLIST = frozenset({"text", "identifier", "meta", "extension"})
+
+TRUNCATION_MARKER = "...[truncated]"
+
+# Successive caps on string values when patient data is over budget
+FHIR_STRING_CAPS = (500, 200, 80, 40)
+
+# Decision fields never capped (citations must stay intact for validation/traceability)
+_UNCAPPED_FIELDS = frozenset({"citations"})
+
+
+def _strip_fhir(value: Any) -> Any:
+    """Recursively drop denylisted keys from FHIR data."""
+    if isinstance(value, dict):
+        return {k: _strip_fhir(v) for k, v in value.items() if k not in FHIR_DENYLIST}
+    if isinstance(value, list):
+        return [_strip_fhir(v) for v in value]
+    return value
+
+
+def _cap_strings(value: Any, cap: int) -> Any:
+    """Recursively shorten string values longer than cap (keys and structure are kept)."""
+    if isinstance(value, str):
+        if len(value) > cap:
+            return value[:cap] + TRUNCATION_MARKER
+        return value
+    if isinstance(value, dict):
+        return {k: _cap_strings(v, cap) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_cap_strings(v, cap) for v in value]
+    return value
+
+
+def compact_fhir(patient_fhir: Dict[str, Any], max_chars: int = 2000) -> str:
+    """
+    Serialize patient FHIR data compactly for prompts.
+    
+    Over budget, long string values are shortened step by step (FHIR_STRING_CAPS)
+    so the result is always valid JSON with every field present. If it still
+    does not fit, it is returned over budget rather than cut mid-value.
+    
+    Args:
+        patient_fhir: Patient FHIR data
+        max_chars: Maximum length of the serialized string
+        
+    Returns:
+        Compact JSON string
+    """
+    stripped = _strip_fhir(patient_fhir)
+    text = orjson.dumps(stripped).decode()
+    if len(text) <= max_chars:
+        return text
+    
+    original_len = len(text)
+    for cap in FHIR_STRING_CAPS:
+        text = orjson.dumps(_cap_strings(stripped, cap)).decode()
+        if len(text) <= max_chars:
+            logger.warning(
+                "Patient data truncated for prompt: %d -> %d chars (strings capped at %d)",
+                original_len, len(text), cap
+            )
+            return text
+    
+    logger.warning(
+        "Patient data over prompt budget after truncation: %d -> %d chars (max %d)",
+        original_len, len(text), max_chars
+    )
+    return text
+
+
+def compact_agent_decisions(
+    decisions: List[Dict[str, Any]],
+    max_items: int = 3
+) -> List[Dict[str, Any]]:
+    """
+    Cap list fields of agent decisions for the arbiter prompt.
+    
+    Args:
+        decisions: Agent dicts with 'name' and 'decision'
+        max_items: Maximum items kept per list field (citations are kept whole)
+        
+    Returns:
+        Agent dicts with capped decision lists
+    """
+    compacted = []
+    for agent in decisions:
+        decision = {
+            key: value[:max_items] if isinstance(value, list) and key not in _UNCAPPED_FIELDS else value
+            for key, value in agent["decision"].items()
+        }
+        compacted.append({"name": agent["name"], "decision": decision})
+    return compacted
@@ -1,13 +1,65 @@
 """FAISS-based RAG index with incremental updates."""
+import logging
 import os
-import json
-import hashlib
+import sys
+from array import array
+from collections import OrderedDict
 import faiss
+import msgpack
 import numpy as np
+import orjson
+import xxhash
 from typing import List, Dict, Any, Optional
 from sentence_transformers import SentenceTransformer
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Supported FAISS base index types
+INDEX_TYPES = ("flat", "hnsw", "sq_fp16", "pq")
+# Index types that must be trained before vectors can be added
+TRAINED_INDEX_TYPES = ("pq",)
+PQ_NBITS = 8
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH_MIN = 64
+
+# Embedding model precisions ("auto" = fp16 on CUDA, fp32 otherwise)
+EMB_PRECISIONS = ("auto", "fp32", "fp16", "int8")
+
+# Keep UIDs within non-negative int64 (FAISS ids)
+UID_MASK = (1 << 63) - 1
+
+# Columnar metadata file format version
+METADATA_VERSION = 1
+
+# Read-only memory-mapped index loading. IO_FLAG_MMAP_IFC (newer faiss) also maps
+# flat-code storage (flat/SQ/PQ vectors, HNSW storage); plain IO_FLAG_MMAP still
+# copies those codes into RAM
+MMAP_IO_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+def _select_device(device: str) -> str:
+    """Resolve the embedding device ("auto" picks CUDA when available)."""
+    if device != "auto":
+        return device
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _resolve_precision(precision: str, device: str) -> str:
+    """Resolve the embedding precision for a device."""
+    precision = precision.lower()
+    if precision not in EMB_PRECISIONS:
+        raise ValueError(f"Unknown embedding precision: {precision} (expected one of {EMB_PRECISIONS})")
+    on_cuda = device.startswith("cuda")
+    if precision == "auto":
+        return "fp16" if on_cuda else "fp32"
+    if precision == "fp16" and not on_cuda:
+        # fp16 matmuls are slow or unsupported on CPU; embeddings are near-identical in fp32
+        logger.warning("fp16 embeddings need CUDA, using fp32 on CPU")
+        return "fp32"
+    return precision
+
 
 class RAGFAISSIndex:
     """FAISS index for RAG with incremental updates."""
@@ -17,47 +69,152 @@ class RAGFAISSIndex:
         emb_model_name: str = None,
         dim: int = 384,
         chunk_size: int = None,
-        chunk_overlap: int = None
+        chunk_overlap: int = None,
+        index_type: str = None,
+        hnsw_m: int = None,
+        precision: str = None,
+        pq_m: int = None
     ):
         self.emb_model_name = emb_model_name or settings.RAG_EMB_MODEL
         self.dim = dim
         self.chunk_size = chunk_size or settings.RAG_CHUNK_SIZE
         self.chunk_overlap = chunk_overlap or settings.RAG_CHUNK_OVERLAP
+        self.index_type = (index_type or settings.RAG_INDEX_TYPE).lower()
+        self.hnsw_m = hnsw_m or settings.RAG_HNSW_M
+        self.pq_m = pq_m or settings.RAG_PQ_M
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown RAG index type: {self.index_type} (expected one of {INDEX_TYPES})")
         
-        # Load embedding model
-        self.emb_model = SentenceTransformer(self.emb_model_name)
+        # Load embedding model pinned to one device
+        self.device = _select_device(settings.RAG_EMB_DEVICE)
+        self.precision = _resolve_precision(precision or settings.RAG_EMB_PRECISION, self.device)
+        if self.precision == "int8":
+            # Dynamic int8 quantization runs on CPU only
+            self.device = "cpu"
+        self.emb_model = SentenceTransformer(self.emb_model_name, device=self.device)
+        if self.precision == "fp16":
+            self.emb_model.half()
+        elif self.precision == "int8":
+            import torch
+            transformer = self.emb_model[0]
+            transformer.auto_model = torch.quantization.quantize_dynamic(
+                transformer.auto_model, {torch.nn.Linear}, dtype=torch.qint8
+            )
         # Update dim from model
         self.dim = self.emb_model.get_sentence_embedding_dimension()
         
         # Initialize FAISS index
-        # Use IndexIDMap2 to support add/remove by ID
-        base_index = faiss.IndexFlatIP(self.dim)  # Inner product for cosine similarity
-        self.index = faiss.IndexIDMap2(base_index)
+        self.index = self._build_index()
+        
+        # Path of the saved index while self.index is a read-only mmap of it
+        self._mmap_path: Optional[str] = None
+        
+        # Vectors buffered until a trainable index has enough to train on
+        self._pending_embs: List[np.ndarray] = []
+        self._pending_ids: List[np.ndarray] = []
         
-        # Metadata: uid -> {source, chunk_id, text}
-        self.metadata: Dict[int, Dict[str, Any]] = {}
+        # Metadata as parallel columns (row i describes uids[i]); uid_to_row maps
+        # live uids to rows, so rows of removed/re-added uids are dropped on save
+        self.uids: List[int] = []
+        self.sources: List[str] = []
+        self.chunk_ids: List[str] = []
+        self.texts: List[str] = []
+        self.offsets = array("q")
+        self.uid_to_row: Dict[int, int] = {}
+        
+        # Query embedding LRU: query -> (1, dim) float32
+        self._q_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._q_cache_size = settings.RAG_QUERY_CACHE_SIZE
+    
+    def _build_index(self) -> faiss.Index:
+        """Build an empty ID-mapped inner-product index of the configured type."""
+        # Inner product on normalized embeddings == cosine similarity
+        if self.index_type == "hnsw":
+            base_index = faiss.IndexHNSWFlat(self.dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            base_index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        elif self.index_type == "sq_fp16":
+            base_index = faiss.IndexScalarQuantizer(
+                self.dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT
+            )
+        elif self.index_type == "pq":
+            if self.dim % self.pq_m != 0:
+                raise ValueError(f"Embedding dim {self.dim} is not divisible by RAG_PQ_M={self.pq_m}")
+            base_index = faiss.IndexPQ(self.dim, self.pq_m, PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+        else:
+            base_index = faiss.IndexFlatIP(self.dim)
+        # Use IndexIDMap2 to support add/remove by ID
+        return faiss.IndexIDMap2(base_index)
+    
+    def _ensure_writable(self):
+        """Read a memory-mapped index fully into memory before its first mutation."""
+        if self._mmap_path is not None:
+            # Mapped (viewed) storage can not be cloned and then grown, so re-read the file
+            self.index = faiss.read_index(self._mmap_path)
+            self._mmap_path = None
+    
+    def _add_vectors(self, embs: np.ndarray, uids_array: np.ndarray):
+        """Add vectors, buffering them while the index still needs training."""
+        if self.index.is_trained:
+            self._ensure_writable()
+            self.index.add_with_ids(embs, uids_array)
+            return
+        self._pending_embs.append(embs)
+        self._pending_ids.append(uids_array)
+        if sum(len(ids) for ids in self._pending_ids) >= settings.RAG_PQ_TRAIN_SIZE:
+            self._train_pending()
+    
+    def _train_pending(self):
+        """Train the index on the buffered vectors, then add them."""
+        if not self._pending_ids:
+            return
+        embs = np.concatenate(self._pending_embs)
+        uids_array = np.concatenate(self._pending_ids)
+        min_train = 1 << PQ_NBITS
+        if len(embs) < min_train:
+            raise ValueError(
+                f"{self.index_type} index needs at least {min_train} chunks to train, got {len(embs)}"
+            )
+        self._ensure_writable()
+        self.index.train(embs)
+        self.index.add_with_ids(embs, uids_array)
+        self._pending_embs = []
+        self._pending_ids = []
     
     def _generate_uid(self, source: str, offset: int, text: str) -> int:
-        """Generate unique ID from source:offset:text."""
-        uid_str = f"{source}:{offset}:{text}"
-        sha1 = hashlib.sha1(uid_str.encode()).digest()
-        # Use first 8 bytes as int64
-        return int.from_bytes(sha1[:8], byteorder="big", signed=True)
+        """Generate unique ID from source, offset and text (xxh3_64, non-negative int64)."""
+        h = xxhash.xxh3_64()
+        h.update(source.encode("utf-8"))
+        h.update(offset.to_bytes(8, byteorder="big"))
+        h.update(text.encode("utf-8"))
+        return h.intdigest() & UID_MASK
     
     def _chunk_text(self, text: str) -> List[tuple[int, str]]:
         """Chunk text into overlapping segments."""
+        step = self.chunk_size - self.chunk_overlap
+        if step <= 0:
+            raise ValueError(f"chunk_overlap ({self.chunk_overlap}) must be smaller than chunk_size ({self.chunk_size})")
+        
         chunks = []
-        offset = 0
+        chunk_size = self.chunk_size
         
-        while offset < len(text):
-            chunk = text[offset:offset + self.chunk_size]
-            if not chunk.strip():
+        for offset in range(0, len(text), step):
+            chunk = text[offset:offset + chunk_size]
+            # Whitespace-only chunk ends chunking (isspace() avoids a strip() copy)
+            if chunk.isspace():
                 break
             chunks.append((offset, chunk))
-            offset += self.chunk_size - self.chunk_overlap
         
         return chunks
     
+    def _append_row(self, uid: int, source: str, chunk_id: str, text: str, offset: int):
+        """Append one metadata row and point uid at it."""
+        self.uid_to_row[uid] = len(self.uids)
+        self.uids.append(uid)
+        self.sources.append(source)
+        self.chunk_ids.append(chunk_id)
+        self.texts.append(text)
+        self.offsets.append(offset)
+    
     def add_chunks(
         self,
         source: str,
@@ -70,47 +227,103 @@ class RAGFAISSIndex:
         Returns:
             List of UIDs added
         """
-        chunks = self._chunk_text(text)
+        return self.add_chunks_bulk([(source, text, chunk_id_prefix)])[0]
+    
+    def add_chunks_bulk(
+        self,
+        items: List[tuple[str, str, Optional[str]]],
+        batch_size: Optional[int] = None
+    ) -> List[List[int]]:
+        """
+        Add chunks from several (source, text, chunk_id_prefix) items, embedding
+        all of their chunks together in batches of batch_size.
+        
+        Metadata is only stored once every chunk is embedded, so a failure
+        (e.g. in chunking or encoding) leaves the index unchanged.
+        
+        Returns:
+            List of UIDs added, one list per item
+        """
+        batch_size = batch_size or settings.RAG_EMB_BATCH
+        uids_per_item = []
         uids = []
-        embeddings = []
+        chunk_texts = []
+        rows = []  # (uid, source, chunk_id, text, offset), stored after embedding
         
-        for offset, chunk_text in chunks:
-            uid = self._generate_uid(source, offset, chunk_text)
-            chunk_id = chunk_id_prefix or f"{source}_{offset}"
-            
-            # Embed chunk
-            emb = self.emb_model.encode(chunk_text, normalize_embeddings=True)
-            emb = emb.astype(np.float32)
-            
-            # Store metadata
-            self.metadata[uid] = {
-                "source": source,
-                "chunk_id": chunk_id,
-                "text": chunk_text,
-                "offset": offset
-            }
-            
-            uids.append(uid)
-            embeddings.append(emb)
+        for source, text, chunk_id_prefix in items:
+            item_uids = []
+            source = sys.intern(source)
+            for offset, chunk_text in self._chunk_text(text):
+                uid = self._generate_uid(source, offset, chunk_text)
+                chunk_id = chunk_id_prefix or f"{source}_{offset}"
+                rows.append((uid, source, chunk_id, chunk_text, offset))
+                item_uids.append(uid)
+                chunk_texts.append(chunk_text)
+            uids_per_item.append(item_uids)
+            uids.extend(item_uids)
+        
+        if not chunk_texts:
+            return uids_per_item
         
-        if embeddings:
-            # Add to FAISS index
-            embeddings_array = np.array(embeddings, dtype=np.float32)
-            uids_array = np.array(uids, dtype=np.int64)
-            self.index.add_with_ids(embeddings_array, uids_array)
+        # Embed in batches straight into one preallocated contiguous array
+        embs = np.empty((len(chunk_texts), self.dim), dtype=np.float32)
+        for start in range(0, len(chunk_texts), batch_size):
+            embs[start:start + batch_size] = self.emb_model.encode(
+                chunk_texts[start:start + batch_size],
+                batch_size=batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False
+            )
         
-        return uids
+        # Store metadata
+        for row in rows:
+            self._append_row(*row)
+        
+        # Add to FAISS index
+        uids_array = np.asarray(uids, dtype=np.int64)
+        self._add_vectors(embs, uids_array)
+        
+        return uids_per_item
     
     def remove_uids(self, uids: List[int]):
         """Remove chunks by UIDs."""
+        if not uids:
+            return
+        
+        # HNSW graphs cannot drop vectors: removed uids stay in the graph and
+        # are filtered during search because they are no longer in uid_to_row
+        if self.index_type != "hnsw":
+            self._ensure_writable()
+            selector = faiss.IDSelectorBatch(np.asarray(uids, dtype=np.int64))
+            self.index.remove_ids(selector)
+        
+        # Drop buffered (not yet trained) vectors too
+        if self._pending_ids:
+            removed = np.asarray(uids, dtype=np.int64)
+            for i, ids in enumerate(self._pending_ids):
+                keep = ~np.isin(ids, removed)
+                self._pending_ids[i] = ids[keep]
+                self._pending_embs[i] = self._pending_embs[i][keep]
+        
         for uid in uids:
-            if uid in self.metadata:
-                del self.metadata[uid]
+            self.uid_to_row.pop(uid, None)
+    
+    def _embed_query(self, query: str) -> np.ndarray:
+        """Embed query as a (1, dim) float32 array, using the LRU cache."""
+        cached = self._q_cache.get(query)
+        if cached is not None:
+            self._q_cache.move_to_end(query)
+            return cached
         
-        # FAISS doesn't support direct removal, so we rebuild
-        # For production, consider using IndexIDMap with remove_ids (if available)
-        # For now, we'll mark as removed in metadata and filter during search
-        # This is a limitation - full rebuild would be needed for true removal
+        query_emb = self.emb_model.encode(query, normalize_embeddings=True)
+        query_emb = np.ascontiguousarray(query_emb, dtype=np.float32).reshape(1, -1)
+        
+        if self._q_cache_size > 0:
+            self._q_cache[query] = query_emb
+            if len(self._q_cache) > self._q_cache_size:
+                self._q_cache.popitem(last=False)
+        return query_emb
     
     def search(self, query: str, top_k: int = 6) -> List[Dict[str, Any]]:
         """
@@ -120,14 +333,23 @@ class RAGFAISSIndex:
             List of hits with score, source, chunk_id, text
         """
         # Embed query
-        query_emb = self.emb_model.encode(query, normalize_embeddings=True)
-        query_emb = query_emb.astype(np.float32).reshape(1, -1)
+        query_emb = self._embed_query(query)
         
-        # Search
-        k = min(top_k, self.index.ntotal) if self.index.ntotal > 0 else 0
+        # Buffered vectors become searchable once the index is trained
+        if self._pending_ids:
+            self._train_pending()
+        
+        # Search; over-fetch by the vectors without live metadata (HNSW tombstones
+        # of removed uids) so they can not push live hits out of the top_k
+        dead = max(0, self.index.ntotal - len(self.uid_to_row))
+        k = min(top_k + dead, self.index.ntotal)
         if k == 0:
             return []
         
+        if self.index_type == "hnsw":
+            base_index = faiss.downcast_index(self.index.index)
+            base_index.hnsw.efSearch = max(k * 4, HNSW_EF_SEARCH_MIN)
+        
         scores, indices = self.index.search(query_emb, k)
         
         hits = []
@@ -135,16 +357,18 @@ class RAGFAISSIndex:
             if idx == -1:  # FAISS returns -1 for invalid indices
                 continue
             
-            if idx not in self.metadata:
+            row = self.uid_to_row.get(int(idx))
+            if row is None:
                 continue
             
-            meta = self.metadata[idx]
             hits.append({
                 "score": float(score),
-                "source": meta["source"],
-                "chunk_id": meta["chunk_id"],
-                "text": meta["text"]
+                "source": self.sources[row],
+                "chunk_id": self.chunk_ids[row],
+                "text": self.texts[row]
             })
+            if len(hits) == top_k:
+                break
         
         return hits
     
@@ -152,14 +376,29 @@ class RAGFAISSIndex:
         """Save index and metadata to directory."""
         os.makedirs(store_dir, exist_ok=True)
         
+        # Train on whatever is buffered so every chunk is persisted
+        self._train_pending()
+        
         # Save FAISS index
+        # Written to a temp file and renamed, so an index mapped from this path stays valid
         index_path = os.path.join(store_dir, "index.faiss")
-        faiss.write_index(self.index, index_path)
+        tmp_path = f"{index_path}.tmp"
+        faiss.write_index(self.index, tmp_path)
+        os.replace(tmp_path, index_path)
         
-        # Save metadata
-        metadata_path = os.path.join(store_dir, "metadata.json")
-        with open(metadata_path, "w", encoding="utf-8") as f:
-            json.dump(self.metadata, f, indent=2, ensure_ascii=False)
+        # Save metadata (live rows only, columnar msgpack)
+        rows = sorted(self.uid_to_row.values())
+        columns = {
+            "version": METADATA_VERSION,
+            "uids": [self.uids[r] for r in rows],
+            "sources": [self.sources[r] for r in rows],
+            "chunk_ids": [self.chunk_ids[r] for r in rows],
+            "texts": [self.texts[r] for r in rows],
+            "offsets": [self.offsets[r] for r in rows]
+        }
+        metadata_path = os.path.join(store_dir, "metadata.msgpack")
+        with open(metadata_path, "wb") as f:
+            f.write(msgpack.packb(columns, use_bin_type=True))
         
         # Save config
         config_path = os.path.join(store_dir, "config.json")
@@ -167,34 +406,81 @@ class RAGFAISSIndex:
             "emb_model": self.emb_model_name,
             "dim": self.dim,
             "chunk_size": self.chunk_size,
-            "chunk_overlap": self.chunk_overlap
+            "chunk_overlap": self.chunk_overlap,
+            "index_type": self.index_type,
+            "hnsw_m": self.hnsw_m,
+            "precision": self.precision,
+            "pq_m": self.pq_m
         }
-        with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(config, f, indent=2)
+        with open(config_path, "wb") as f:
+            f.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+    
+    def _load_columns(self, columns: Dict[str, Any]):
+        """Replace metadata with saved columns."""
+        self.uids = columns["uids"]
+        # Sources and chunk ids repeat across chunks of a document
+        self.sources = [sys.intern(v) for v in columns["sources"]]
+        self.chunk_ids = [sys.intern(v) for v in columns["chunk_ids"]]
+        self.texts = columns["texts"]
+        self.offsets = array("q", columns["offsets"])
+        self.uid_to_row = {uid: row for row, uid in enumerate(self.uids)}
     
     @classmethod
-    def load(cls, store_dir: str) -> "RAGFAISSIndex":
-        """Load index and metadata from directory."""
+    def load(cls, store_dir: str, mmap: bool = True) -> "RAGFAISSIndex":
+        """
+        Load index and metadata from directory.
+        
+        Args:
+            store_dir: Build directory written by save()
+            mmap: Memory-map the FAISS index read-only (shared page cache across
+                workers); pass False when the index will be modified right away
+        """
         # Load config
         config_path = os.path.join(store_dir, "config.json")
-        with open(config_path, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        with open(config_path, "rb") as f:
+            config = orjson.loads(f.read())
         
         # Create instance
         instance = cls(
             emb_model_name=config["emb_model"],
             dim=config["dim"],
             chunk_size=config["chunk_size"],
-            chunk_overlap=config["chunk_overlap"]
+            chunk_overlap=config["chunk_overlap"],
+            # Builds saved before index types existed are flat
+            index_type=config.get("index_type", "flat"),
+            hnsw_m=config.get("hnsw_m"),
+            # Query embeddings must match the build (int8 changes vectors noticeably)
+            precision=config.get("precision"),
+            pq_m=config.get("pq_m")
         )
         
-        # Load FAISS index
+        # Load FAISS index memory-mapped (paged on demand, shared across workers);
+        # it is read into memory on the first add/remove
         index_path = os.path.join(store_dir, "index.faiss")
-        instance.index = faiss.read_index(index_path)
+        if mmap:
+            instance.index = faiss.read_index(index_path, MMAP_IO_FLAGS)
+            instance._mmap_path = index_path
+        else:
+            instance.index = faiss.read_index(index_path)
         
-        # Load metadata
-        metadata_path = os.path.join(store_dir, "metadata.json")
-        with open(metadata_path, "r", encoding="utf-8") as f:
-            instance.metadata = {int(k): v for k, v in json.load(f).items()}
+        # Load metadata (builds before the columnar format have metadata.json)
+        metadata_path = os.path.join(store_dir, "metadata.msgpack")
+        if os.path.exists(metadata_path):
+            with open(metadata_path, "rb") as f:
+                columns = msgpack.unpackb(f.read(), raw=False)
+            instance._load_columns(columns)
+        else:
+            legacy_path = os.path.join(store_dir, "metadata.json")
+            with open(legacy_path, "rb") as f:
+                legacy = orjson.loads(f.read())
+            # Rows are appended straight into the columns (no intermediate int-keyed dict)
+            for uid, meta in legacy.items():
+                instance._append_row(
+                    int(uid),
+                    sys.intern(meta["source"]),
+                    sys.intern(meta["chunk_id"]),
+                    meta["text"],
+                    meta.get("offset", 0)
+                )
         
         return instance
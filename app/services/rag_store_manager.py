@@ -2,10 +2,26 @@
 import os
 import json
 import hashlib
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+import xxhash
+
+# Read size for the pre-3.11 hashing fallback
+HASH_BLOCK_SIZE = 1 << 20
+
+# Fingerprint for source-change detection (not provenance); recorded in the
+# manifest as "hash_algo". Stores without it hold SHA-256 digests.
+SOURCE_HASH_ALGO = "xxh3_128"
+LEGACY_HASH_ALGO = "sha256"
+_HASHERS = {
+    "xxh3_128": xxhash.xxh3_128,
+    "sha256": hashlib.sha256
+}
+
 
 def ensure_store_layout(store_root: str) -> Dict[str, str]:
     """
@@ -26,17 +42,9 @@ def ensure_store_layout(store_root: str) -> Dict[str, str]:
     }
 
 
-def scan_sources(source_dir: str) -> List[Dict[str, Any]]:
-    """
-    Scan source directory for documents.
-    
-    Returns:
-        List of dicts with 'source', 'path', 'sha256'
-    """
-    sources = []
-    
-    if not os.path.exists(source_dir):
-        return sources
+def _collect_files(source_dir: str) -> List[tuple[str, str]]:
+    """Collect (relative path, path) pairs for indexable documents."""
+    files_found = []
     
     for root, dirs, files in os.walk(source_dir):
         # Skip certain directories
@@ -50,26 +58,61 @@ def scan_sources(source_dir: str) -> List[Dict[str, Any]]:
             if file.endswith((".pdf", ".txt", ".md", ".html", ".htm")):
                 file_path = os.path.join(root, file)
                 rel_path = os.path.relpath(file_path, source_dir)
-                
-                # Calculate SHA256
-                sha256 = calculate_sha256(file_path)
-                
-                sources.append({
-                    "source": rel_path,
-                    "path": file_path,
-                    "sha256": sha256
-                })
+                files_found.append((rel_path, file_path))
     
-    return sources
+    return files_found
+
+
+def _hash_many(paths: List[str], hash_algo: str = SOURCE_HASH_ALGO) -> List[str]:
+    """Hash many files in parallel (both hashers release the GIL)."""
+    if len(paths) <= 1:
+        return [calculate_file_hash(p, hash_algo) for p in paths]
+    max_workers = min(len(paths), (os.cpu_count() or 1) * 2)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(calculate_file_hash, paths, [hash_algo] * len(paths)))
+
+
+def scan_sources(source_dir: str, hash_algo: str = SOURCE_HASH_ALGO) -> List[Dict[str, Any]]:
+    """
+    Scan source directory for documents.
+    
+    Returns:
+        List of dicts with 'source', 'path', 'hash'
+    """
+    if not os.path.exists(source_dir):
+        return []
+    
+    files_found = _collect_files(source_dir)
+    hashes = _hash_many([file_path for _, file_path in files_found], hash_algo)
+    
+    return [
+        {
+            "source": rel_path,
+            "path": file_path,
+            "hash": file_hash
+        }
+        for (rel_path, file_path), file_hash in zip(files_found, hashes)
+    ]
+
+
+def calculate_file_hash(file_path: str, hash_algo: str = SOURCE_HASH_ALGO) -> str:
+    """Calculate hex digest of file with hash_algo ('xxh3_128' or 'sha256')."""
+    hasher = _HASHERS[hash_algo]
+    with open(file_path, "rb") as f:
+        if sys.version_info >= (3, 11):
+            return hashlib.file_digest(f, hasher).hexdigest()
+        
+        file_hash = hasher()
+        buf = bytearray(HASH_BLOCK_SIZE)
+        mv = memoryview(buf)
+        while n := f.readinto(buf):
+            file_hash.update(mv[:n])
+        return file_hash.hexdigest()
 
 
 def calculate_sha256(file_path: str) -> str:
     """Calculate SHA256 hash of file."""
-    sha256_hash = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-    return sha256_hash.hexdigest()
+    return calculate_file_hash(file_path, "sha256")
 
 
 def now_build_id() -> str:
@@ -95,7 +138,7 @@ def save_manifest(manifest_path: str, manifest: Dict[str, Any]):
 
 
 def load_sources_json(store_root: str) -> Dict[str, str]:
-    """Load sources.json mapping source -> sha256."""
+    """Load sources.json mapping source -> file hash."""
     sources_path = os.path.join(store_root, "sources.json")
     if os.path.exists(sources_path):
         with open(sources_path, "r", encoding="utf-8") as f:
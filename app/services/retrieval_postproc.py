@@ -1,13 +1,16 @@
 """Post-processing for retrieval hits."""
 from typing import List, Dict, Any
 
+# Control characters (except \t and \n) mapped to None for str.translate
+_CTRL_TRANS = dict.fromkeys((i for i in range(32) if i not in (9, 10)), None)
+
 
 def clean_text_for_prompt(text: str) -> str:
     """Clean text for use in prompts."""
     # Remove excessive whitespace
     text = " ".join(text.split())
     # Remove control characters
-    text = "".join(char for char in text if ord(char) >= 32 or char in "\n\t")
+    text = text.translate(_CTRL_TRANS)
     return text.strip()
 
 
@@ -27,23 +30,20 @@ def filter_and_dedupe_hits(
     Returns:
         Filtered and deduplicated hits
     """
-    # Filter by minimum length
-    filtered = [h for h in hits if len(h.get("text", "")) >= min_chars]
-    
-    # Deduplicate by (source, chunk_id)
+    # Single pass: length filter, dedupe by (source, chunk_id), then per-source cap
     seen = set()
-    deduped = []
-    for hit in filtered:
-        key = (hit["source"], hit["chunk_id"])
-        if key not in seen:
-            seen.add(key)
-            deduped.append(hit)
-    
-    # Cap per source
     source_counts = {}
     capped = []
-    for hit in deduped:
+    for hit in hits:
+        if len(hit.get("text", "")) < min_chars:
+            continue
+        
         source = hit["source"]
+        key = (source, hit["chunk_id"])
+        if key in seen:
+            continue
+        seen.add(key)
+        
         count = source_counts.get(source, 0)
         if count < per_source_cap:
             source_counts[source] = count + 1
@@ -65,13 +65,11 @@ def format_hits_context(hits: List[Dict[str, Any]]) -> str:
     if not hits:
         return "No relevant context found."
     
+    # filter_and_dedupe_hits guarantees source/chunk_id on every hit
     context_parts = ["Available evidence from clinical guidelines:"]
-    for i, hit in enumerate(hits, 1):
-        source = hit.get("source", "unknown")
-        chunk_id = hit.get("chunk_id", "unknown")
-        text = clean_text_for_prompt(hit.get("text", ""))
-        context_parts.append(
-            f"\n[{i}] (source={source} chunk_id={chunk_id})\n{text}"
-        )
+    context_parts.extend(
+        f"\n[{i}] (source={hit['source']} chunk_id={hit['chunk_id']})\n{clean_text_for_prompt(hit.get('text', ''))}"
+        for i, hit in enumerate(hits, 1)
+    )
     
     return "\n".join(context_parts)
@@ -1,10 +1,14 @@
 """Hybrid retriever that loads FAISS index."""
-from typing import List, Dict, Any, Optional
+import logging
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
 from app.config import settings
 from app.services.rag_store_manager import load_manifest, ensure_store_layout
 from app.services.rag_faiss_incremental import RAGFAISSIndex
 import os
 
+logger = logging.getLogger(__name__)
+
 
 class HybridRetriever:
     """Hybrid retriever with FAISS backend."""
@@ -13,12 +17,19 @@ class HybridRetriever:
         self.store_root = store_root or settings.RAG_STORE_ROOT
         self.index: Optional[RAGFAISSIndex] = None
         self.current_build_id: Optional[str] = None
+        # Result LRU: (query, k) -> hits; per instance, so a new build starts empty
+        self._cache: "OrderedDict[Tuple[str, int], Tuple[Dict[str, Any], ...]]" = OrderedDict()
+        self._cache_size = settings.RAG_RETRIEVE_CACHE_SIZE
         
         if settings.RAG_ENABLED:
             self._load_index()
     
     def _load_index(self):
-        """Load current FAISS index from store."""
+        """
+        Load current FAISS index from store (no-op if that build is already loaded).
+        
+        On failure the previously loaded index, if any, is kept.
+        """
         try:
             layout = ensure_store_layout(self.store_root)
             manifest = load_manifest(layout["manifest_path"])
@@ -26,16 +37,27 @@ class HybridRetriever:
             current_build_id = manifest.get("current_build_id")
             if not current_build_id:
                 return
+            if self.index is not None and current_build_id == self.current_build_id:
+                return
             
-            self.current_build_id = current_build_id
             build_dir = os.path.join(layout["builds_dir"], current_build_id)
             
             if os.path.exists(build_dir):
-                self.index = RAGFAISSIndex.load(build_dir)
+                self.index = RAGFAISSIndex.load(build_dir, mmap=True)
+                self.current_build_id = current_build_id
+                self._cache.clear()
         except Exception as e:
             # Log error but don't crash
             print(f"Warning: Failed to load RAG index: {e}")
-            self.index = None
+    
+    def warmup(self):
+        """Run a throwaway search so the first request does not pay model/index warm-up."""
+        if not self.index:
+            return
+        try:
+            self.index.search("ERAS perioperative care", top_k=1)
+        except Exception:
+            logger.exception("Retriever warmup failed")
     
     def retrieve(self, query: str, k: int = 6) -> List[Dict[str, Any]]:
         """
@@ -51,9 +73,50 @@ class HybridRetriever:
         if not self.index:
             return []
         
-        try:
-            hits = self.index.search(query, top_k=k)
-            return hits
-        except Exception as e:
-            print(f"Warning: Retrieval error: {e}")
-            return []
+        key = (query, k)
+        cached = self._cache.get(key)
+        if cached is None:
+            try:
+                cached = tuple(self.index.search(query, top_k=k))
+            except Exception as e:
+                print(f"Warning: Retrieval error: {e}")
+                return []
+            if self._cache_size > 0:
+                self._cache[key] = cached
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        
+        # Callers may mutate hits, so hand out copies
+        return [dict(hit) for hit in cached]
+
+
+# Shared retriever (see get_retriever); its index is reloaded only when the current build changes
+_retriever: Optional[HybridRetriever] = None
+_manifest_mtime: Optional[int] = None
+
+
+def get_retriever() -> HybridRetriever:
+    """
+    Get the process-wide retriever.
+    
+    manifest.json is only re-read when its mtime changes, and the index is
+    only reloaded (HybridRetriever._load_index) when current_build_id differs
+    from the loaded build. While no index is loaded, loading is retried on
+    every call, so a missing or broken build is picked up once it is fixed.
+    """
+    global _retriever, _manifest_mtime
+    
+    manifest_path = os.path.join(settings.RAG_STORE_ROOT, "manifest.json")
+    try:
+        mtime = os.stat(manifest_path).st_mtime_ns
+    except OSError:
+        mtime = None
+    
+    if _retriever is None:
+        _retriever = HybridRetriever()
+    elif settings.RAG_ENABLED and (_retriever.index is None or mtime != _manifest_mtime):
+        _retriever._load_index()
+    _manifest_mtime = mtime
+    return _retriever
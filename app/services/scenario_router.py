@@ -1,4 +1,5 @@
 """Scenario routing logic."""
+import re
 from typing import Optional, Dict, Any
 from enum import Enum
 
@@ -11,6 +12,26 @@ class Scenario(str, Enum):
     UNKNOWN = "UNKNOWN"
 
 
+def _keyword_pattern(*keywords: str) -> "re.Pattern[str]":
+    """Compile literal keywords into one alternation (single scan per scenario)."""
+    return re.compile("|".join(re.escape(kw) for kw in keywords))
+
+
+# Question keywords per scenario, in priority order
+_KEYWORD_PATTERNS = (
+    (Scenario.PONV, _keyword_pattern("ponv", "postoperative nausea", "nausea", "vomiting")),
+    (Scenario.POD, _keyword_pattern("pod", "delirium", "confusion", "cognitive")),
+    (Scenario.CHEST_TUBE, _keyword_pattern("chest tube", "drain", "pleural", "thoracic"))
+)
+
+# Patient data keys per scenario, in priority order
+_FHIR_KEYS = (
+    (Scenario.PONV, frozenset({"nausea_score", "vomiting_episodes"})),
+    (Scenario.POD, frozenset({"nu_desc", "cam_score"})),
+    (Scenario.CHEST_TUBE, frozenset({"drain_output_ml_24h", "chest_tube_days"}))
+)
+
+
 def infer_scenario(
     explicit: Optional[str],
     question: str,
@@ -36,27 +57,15 @@ def infer_scenario(
     # Infer from question keywords
     question_lower = question.lower()
     
-    if any(kw in question_lower for kw in ["ponv", "postoperative nausea", "nausea", "vomiting"]):
-        return Scenario.PONV
-    
-    if any(kw in question_lower for kw in ["pod", "delirium", "confusion", "cognitive"]):
-        return Scenario.POD
-    
-    if any(kw in question_lower for kw in ["chest tube", "drain", "pleural", "thoracic"]):
-        return Scenario.CHEST_TUBE
+    for scenario, pattern in _KEYWORD_PATTERNS:
+        if pattern.search(question_lower):
+            return scenario
     
     # Infer from patient data structure
     if patient_fhir:
-        # Check for PONV-related fields
-        if any(key in patient_fhir for key in ["nausea_score", "vomiting_episodes"]):
-            return Scenario.PONV
-        
-        # Check for POD-related fields
-        if any(key in patient_fhir for key in ["nu_desc", "cam_score"]):
-            return Scenario.POD
-        
-        # Check for chest tube fields
-        if any(key in patient_fhir for key in ["drain_output_ml_24h", "chest_tube_days"]):
-            return Scenario.CHEST_TUBE
+        patient_keys = patient_fhir.keys()
+        for scenario, keys in _FHIR_KEYS:
+            if not patient_keys.isdisjoint(keys):
+                return scenario
     
     return Scenario.UNKNOWN
@@ -1,15 +1,36 @@
 """Trace logging for requests and responses."""
-import json
+import asyncio
+import hashlib
+import logging
 import os
+import time
+from contextlib import suppress
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 import uuid
+import orjson
 from app.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Background writer queue bounds
+TRACE_QUEUE_MAXSIZE = 1024
+TRACE_BATCH_SIZE = 32
+
+
+# (epoch second, "trace_YYYYmmdd_HHMMSS") of the last ID; strftime runs once per second
+_trace_prefix: Tuple[int, str] = (-1, "")
+
 
 def new_trace_id() -> str:
     """Generate a new trace ID."""
-    return f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+    global _trace_prefix
+    sec = int(time.time())
+    cached_sec, prefix = _trace_prefix
+    if sec != cached_sec:
+        prefix = f"trace_{time.strftime('%Y%m%d_%H%M%S', time.localtime(sec))}"
+        _trace_prefix = (sec, prefix)
+    return f"{prefix}_{os.urandom(4).hex()}"
 
 
 class TraceLogger:
@@ -18,14 +39,42 @@ class TraceLogger:
     def __init__(self, trace_root: str = None):
         self.trace_root = trace_root or settings.TRACE_ROOT
         os.makedirs(self.trace_root, exist_ok=True)
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
     
-    def write(self, trace_id: str, payload: Dict[str, Any]) -> str:
+    def write_fhir(self, patient_fhir: Dict[str, Any]) -> str:
+        """
+        Store patient FHIR data once under fhir/<sha256>.json (content-addressed).
+        
+        Returns:
+            SHA-256 hex digest of the key-sorted FHIR JSON
+        """
+        blob = orjson.dumps(patient_fhir, option=orjson.OPT_SORT_KEYS)
+        digest = hashlib.sha256(blob).hexdigest()
+        fhir_dir = os.path.join(self.trace_root, "fhir")
+        fhir_file = os.path.join(fhir_dir, f"{digest}.json")
+        if not os.path.exists(fhir_file):
+            os.makedirs(fhir_dir, exist_ok=True)
+            tmp_file = f"{fhir_file}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_file, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_file, fhir_file)
+        return digest
+    
+    def write(
+        self,
+        trace_id: str,
+        payload: Dict[str, Any],
+        patient_fhir: Optional[Dict[str, Any]] = None
+    ) -> str:
         """
         Write trace payload to file.
         
         Args:
             trace_id: Trace identifier
-            payload: Trace data (request, hits, agents, arbiter, response, etc.)
+            payload: Trace data (request_summary, hits, agents, arbiter, response, etc.)
+            patient_fhir: Patient data; stored via write_fhir and referenced by
+                request_summary.fhir_sha256 instead of being inlined
             
         Returns:
             Path to trace file
@@ -35,15 +84,81 @@ class TraceLogger:
         
         trace_file = os.path.join(self.trace_root, f"{trace_id}.json")
         
-        # Add timestamp
-        payload["timestamp"] = datetime.now().isoformat()
+        if patient_fhir is not None:
+            payload.setdefault("request_summary", {})["fhir_sha256"] = self.write_fhir(patient_fhir)
+        
+        # Add timestamp (orjson serializes datetime as ISO 8601, local time as before)
+        payload["timestamp"] = datetime.now()
         payload["trace_id"] = trace_id
         
-        with open(trace_file, "w", encoding="utf-8") as f:
-            json.dump(payload, f, indent=2, ensure_ascii=False)
+        with open(trace_file, "wb") as f:
+            f.write(orjson.dumps(payload, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
         
         return trace_file
 
+    
+    def start(self):
+        """Start the background writer on the running event loop (idempotent)."""
+        loop = asyncio.get_running_loop()
+        if self._consumer is not None and not self._consumer.done() and self._consumer.get_loop() is loop:
+            return
+        self._queue = asyncio.Queue(maxsize=TRACE_QUEUE_MAXSIZE)
+        self._consumer = loop.create_task(self._consume())
+    
+    def submit(
+        self,
+        trace_id: str,
+        payload: Dict[str, Any],
+        patient_fhir: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Queue a trace for the background writer.
+        
+        Only a put_nowait() runs on the request path; serialization and disk
+        IO happen in the consumer. Falls back to a direct write when full.
+        """
+        if not settings.TRACE_ENABLED:
+            return
+        self.start()
+        try:
+            self._queue.put_nowait((trace_id, payload, patient_fhir))
+        except asyncio.QueueFull:
+            self.write(trace_id, payload, patient_fhir)
+    
+    async def _consume(self):
+        """Write queued traces in batches, one worker-thread hop per batch."""
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < TRACE_BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    def _write_batch(self, batch: List[Tuple[str, Dict[str, Any], Optional[Dict[str, Any]]]]):
+        """Write a batch of traces (runs in a worker thread)."""
+        for trace_id, payload, patient_fhir in batch:
+            try:
+                self.write(trace_id, payload, patient_fhir)
+            except Exception:
+                logger.exception("Failed to write trace %s", trace_id)
+    
+    async def drain(self):
+        """Wait until all queued traces are written."""
+        if self._consumer is not None and not self._consumer.done():
+            await self._queue.join()
+    
+    async def aclose(self):
+        """Drain the queue and stop the background writer."""
+        await self.drain()
+        if self._consumer is not None:
+            self._consumer.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._consumer
+            self._consumer = None
+
 
 # Global trace logger instance
 trace_logger = TraceLogger()
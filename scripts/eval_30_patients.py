@@ -1,17 +1,29 @@
 """Evaluate 30 patients from JSONL file."""
 import os
 import sys
-import json
 import csv
+import logging
 import asyncio
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
+import orjson
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.schemas import ERASRequest
 from app.services.decision_pipeline import run_decision
+from app.services.trace_logger import trace_logger
+
+log = logging.getLogger(__name__)
+
+
+def _iter_patients(path: str) -> Iterator[Dict[str, Any]]:
+    """Yield patients from a JSONL file (binary read, orjson per line)."""
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
 
 
 async def evaluate_patient(patient_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -27,89 +39,107 @@ async def evaluate_patient(patient_data: Dict[str, Any]) -> Dict[str, Any]:
     return result
 
 
-async def main():
-    """Main evaluation function."""
-    patients_jsonl = os.getenv("PATIENTS_JSONL", "data/patients.jsonl")
-    
-    if not os.path.exists(patients_jsonl):
-        print(f"Error: Patients file not found: {patients_jsonl}")
-        print("Please set PATIENTS_JSONL environment variable or create the file.")
-        return
-    
-    print(f"Reading patients from: {patients_jsonl}")
-    
-    # Read patients
-    patients = []
-    with open(patients_jsonl, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                patients.append(json.loads(line))
-    
-    print(f"Found {len(patients)} patients")
-    
-    # Evaluate each patient
-    results = []
-    for i, patient in enumerate(patients, 1):
-        patient_id = patient.get("patient_id", f"patient_{i}")
-        print(f"\n[{i}/{len(patients)}] Evaluating {patient_id}...")
-        
+async def evaluate_indexed(
+    i: int,
+    total: int,
+    patient: Dict[str, Any],
+    sem: asyncio.Semaphore
+) -> Dict[str, Any]:
+    """Evaluate one patient under the concurrency limit; errors become result rows."""
+    patient_id = patient.get("patient_id", f"patient_{i}")
+    async with sem:
+        log.info(f"\n[{i}/{total}] Evaluating {patient_id}...")
         try:
             result = await evaluate_patient(patient)
             result["patient_id"] = patient_id
             result["scenario"] = result.get("metrics", {}).get("scenario", "UNKNOWN")
-            results.append(result)
-            print(f"  ✓ Completed (latency: {result.get('metrics', {}).get('latency_ms', 0)}ms)")
+            log.info(f"  ✓ {patient_id} completed (latency: {result.get('metrics', {}).get('latency_ms', 0)}ms)")
+            return result
         except Exception as e:
-            print(f"  ✗ Error: {e}")
-            results.append({
+            log.error(f"  ✗ {patient_id} error: {e}")
+            return {
                 "patient_id": patient_id,
                 "error": str(e),
                 "scenario": patient.get("scenario", "UNKNOWN"),
                 "final_recommendation": "ERROR",
                 "metrics": {"latency_ms": 0, "errors": [str(e)]}
-            })
+            }
+
+
+async def main():
+    """Main evaluation function."""
+    patients_jsonl = os.getenv("PATIENTS_JSONL", "data/patients.jsonl")
+    
+    if not os.path.exists(patients_jsonl):
+        log.error(f"Patients file not found: {patients_jsonl}")
+        log.error("Please set PATIENTS_JSONL environment variable or create the file.")
+        return
+    
+    log.info(f"Reading patients from: {patients_jsonl}")
+    
+    # Read patients (materialized once for the progress count)
+    patients = list(_iter_patients(patients_jsonl))
+    
+    log.info(f"Found {len(patients)} patients")
+    
+    # Evaluate patients concurrently (bounded); gather keeps input order
+    concurrency = max(1, int(os.getenv("EVAL_CONCURRENCY", "5")))
+    log.info(f"Concurrency: {concurrency}")
+    sem = asyncio.Semaphore(concurrency)
+    results = await asyncio.gather(*(
+        evaluate_indexed(i, len(patients), patient, sem)
+        for i, patient in enumerate(patients, 1)
+    ))
+    
+    # Flush queued trace files before the event loop exits
+    await trace_logger.drain()
     
     # Write results.jsonl
     results_file = "results.jsonl"
-    print(f"\nWriting results to: {results_file}")
-    with open(results_file, "w", encoding="utf-8") as f:
-        for result in results:
-            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+    log.info(f"\nWriting results to: {results_file}")
+    with open(results_file, "wb") as f:
+        f.writelines(
+            orjson.dumps(result, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+            for result in results
+        )
     
     # Write summary.csv
     summary_file = "summary.csv"
-    print(f"Writing summary to: {summary_file}")
+    log.info(f"Writing summary to: {summary_file}")
     
+    rows = []
+    for result in results:
+        metrics = result.get("metrics", {})
+        citations = result.get("citations", [])
+        
+        # Extract arbiter errors
+        errors = metrics.get("errors", [])
+        arbiter_errors = [e for e in errors if "arbiter" in str(e).lower()] or ["none"]
+        
+        rows.append({
+            "patient_id": result.get("patient_id", "unknown"),
+            "scenario": result.get("scenario", "UNKNOWN"),
+            "final_recommendation": result.get("final_recommendation", "N/A"),
+            "latency_ms": metrics.get("latency_ms", 0),
+            "citations_n": len(citations),
+            "trace_id": metrics.get("trace_id", "N/A"),
+            "errors_arbiter": "; ".join(arbiter_errors)
+        })
+    
+    # Rows are built in memory and written with a single writerows call
     with open(summary_file, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=[
             "patient_id", "scenario", "final_recommendation",
             "latency_ms", "citations_n", "trace_id", "errors_arbiter"
         ])
         writer.writeheader()
-        
-        for result in results:
-            metrics = result.get("metrics", {})
-            citations = result.get("citations", [])
-            
-            # Extract arbiter errors
-            errors = metrics.get("errors", [])
-            arbiter_errors = [e for e in errors if "arbiter" in str(e).lower()] or ["none"]
-            
-            writer.writerow({
-                "patient_id": result.get("patient_id", "unknown"),
-                "scenario": result.get("scenario", "UNKNOWN"),
-                "final_recommendation": result.get("final_recommendation", "N/A"),
-                "latency_ms": metrics.get("latency_ms", 0),
-                "citations_n": len(citations),
-                "trace_id": metrics.get("trace_id", "N/A"),
-                "errors_arbiter": "; ".join(arbiter_errors)
-            })
+        writer.writerows(rows)
     
-    print(f"\nEvaluation complete!")
-    print(f"  Results: {results_file}")
-    print(f"  Summary: {summary_file}")
+    log.info(f"\nEvaluation complete!")
+    log.info(f"  Results: {results_file}")
+    log.info(f"  Summary: {summary_file}")
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     asyncio.run(main())
@@ -2,6 +2,8 @@
 import os
 import sys
 import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Add parent directory to path
@@ -10,12 +12,25 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 from app.config import settings
 from app.services.rag_store_manager import (
     ensure_store_layout, scan_sources, load_manifest, save_manifest,
-    load_sources_json, save_sources_json, now_build_id
+    load_sources_json, save_sources_json, now_build_id,
+    SOURCE_HASH_ALGO, LEGACY_HASH_ALGO
 )
 from app.services.rag_faiss_incremental import RAGFAISSIndex
 from pypdf import PdfReader
 import re
 
+try:
+    import fitz  # pymupdf: optional, much faster PDF text extraction
+except ImportError:
+    fitz = None
+
+log = logging.getLogger(__name__)
+
+# HTML text extraction patterns (compiled once)
+_SCRIPT_STYLE_RE = re.compile(r'<(script|style)[^>]*>.*?</\1>', re.DOTALL | re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+_WS_RE = re.compile(r'\s+')
+
 
 def read_text_file(file_path: str) -> str:
     """Read text from file."""
@@ -29,7 +44,14 @@ def read_text_file(file_path: str) -> str:
 
 
 def read_pdf_file(file_path: str) -> str:
-    """Read text from PDF file."""
+    """Read text from PDF file (pymupdf if installed, else pypdf)."""
+    if fitz is not None:
+        doc = fitz.open(file_path)
+        try:
+            return "\n".join(page.get_text("text") for page in doc)
+        finally:
+            doc.close()
+    
     reader = PdfReader(file_path)
     text_parts = []
     for page in reader.pages:
@@ -46,16 +68,14 @@ def read_html_file(file_path: str) -> str:
         with open(file_path, "r", encoding="latin-1") as f:
             html_content = f.read()
     
-    # Remove script and style elements
-    html_content = re.sub(r'<script[^>]*>.*?</script>', '', html_content, flags=re.DOTALL | re.IGNORECASE)
-    html_content = re.sub(r'<style[^>]*>.*?</style>', '', html_content, flags=re.DOTALL | re.IGNORECASE)
+    # Remove script and style elements (one pass)
+    html_content = _SCRIPT_STYLE_RE.sub('', html_content)
     
     # Remove HTML tags but keep text
-    text = re.sub(r'<[^>]+>', ' ', html_content)
+    text = _TAG_RE.sub(' ', html_content)
     
-    # Clean up whitespace
-    text = re.sub(r'\s+', ' ', text)
-    text = re.sub(r'\n\s*\n', '\n', text)
+    # Clean up whitespace (collapses newlines too, so one pass suffices)
+    text = _WS_RE.sub(' ', text)
     
     return text.strip()
 
@@ -74,7 +94,7 @@ def read_document(file_path: str) -> str:
 
 def main():
     """Main update function."""
-    print("Starting FAISS index update...")
+    log.info("Starting FAISS index update...")
     
     # Ensure store layout
     layout = ensure_store_layout(settings.RAG_STORE_ROOT)
@@ -89,9 +109,20 @@ def main():
     current_sources = load_sources_json(settings.RAG_STORE_ROOT)
     
     # Scan source directory
-    print(f"Scanning source directory: {settings.RAG_SOURCE_DIR}")
+    log.info(f"Scanning source directory: {settings.RAG_SOURCE_DIR}")
     scanned_sources = scan_sources(settings.RAG_SOURCE_DIR)
-    scanned_dict = {s["source"]: s["sha256"] for s in scanned_sources}
+    scanned_dict = {s["source"]: s["hash"] for s in scanned_sources}
+    
+    # Stores written before hash_algo was recorded hold SHA-256 digests:
+    # compare against those once, then sources.json is rewritten with xxh3
+    compare_hashes = scanned_dict
+    rehash = manifest.get("hash_algo", LEGACY_HASH_ALGO) != SOURCE_HASH_ALGO
+    if rehash and current_sources:
+        log.info(f"Comparing against legacy {LEGACY_HASH_ALGO} hashes (one-time)...")
+        compare_hashes = {
+            s["source"]: s["hash"]
+            for s in scan_sources(settings.RAG_SOURCE_DIR, LEGACY_HASH_ALGO)
+        }
     
     # Determine changes
     to_add = []
@@ -100,41 +131,65 @@ def main():
     
     for source_info in scanned_sources:
         source = source_info["source"]
-        sha256 = source_info["sha256"]
         
         if source not in current_sources:
             to_add.append(source_info)
-        elif current_sources[source] != sha256:
+        elif current_sources[source] != compare_hashes.get(source):
             to_update.append(source_info)
     
     for source in current_sources:
         if source not in scanned_dict:
             to_remove.append(source)
     
-    print(f"Changes detected:")
-    print(f"  Add: {len(to_add)}")
-    print(f"  Update: {len(to_update)}")
-    print(f"  Remove: {len(to_remove)}")
+    log.info(f"Changes detected:")
+    log.info(f"  Add: {len(to_add)}")
+    log.info(f"  Update: {len(to_update)}")
+    log.info(f"  Remove: {len(to_remove)}")
     
     if not to_add and not to_update and not to_remove:
-        print("No changes detected. Index is up to date.")
+        log.info("No changes detected. Index is up to date.")
+        if rehash:
+            manifest["hash_algo"] = SOURCE_HASH_ALGO
+            save_manifest(manifest_path, manifest)
+            save_sources_json(settings.RAG_STORE_ROOT, scanned_dict)
         return
     
+    # Parse added/updated documents in worker processes (PDF extraction is
+    # CPU-bound). This runs before the index and embedding model are loaded, so
+    # workers are forked before any torch/FAISS thread pools start and do not
+    # copy the model's memory; embedding stays in this process, in order.
+    to_process = to_add + to_update
+    items = []
+    if to_process:
+        log.info(f"Processing {len(to_process)} sources...")
+        workers = min(len(to_process), os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futures = [(s, ex.submit(read_document, s["path"])) for s in to_process]
+            for source_info, fut in futures:
+                source = source_info["source"]
+                
+                log.info(f"  Processing: {source}")
+                try:
+                    items.append((source, fut.result(), source))
+                except Exception as e:
+                    log.error(f"    Error processing {source}: {e}")
+    
     # Load existing index if available
     index = None
     if current_build_id:
         current_build_dir = os.path.join(builds_dir, current_build_id)
         if os.path.exists(current_build_dir):
-            print(f"Loading existing index from build: {current_build_id}")
+            log.info(f"Loading existing index from build: {current_build_id}")
             try:
-                index = RAGFAISSIndex.load(current_build_dir)
+                # Read into memory: the index is modified right away
+                index = RAGFAISSIndex.load(current_build_dir, mmap=False)
             except Exception as e:
-                print(f"Warning: Failed to load existing index: {e}")
-                print("Creating new index...")
+                log.warning(f"Failed to load existing index: {e}")
+                log.info("Creating new index...")
                 index = None
     
     if index is None:
-        print("Creating new index...")
+        log.info("Creating new index...")
         index = RAGFAISSIndex(
             emb_model_name=settings.RAG_EMB_MODEL,
             chunk_size=settings.RAG_CHUNK_SIZE,
@@ -143,36 +198,40 @@ def main():
     
     # Remove old chunks
     if to_remove:
-        print(f"Removing {len(to_remove)} sources...")
+        log.info(f"Removing {len(to_remove)} sources...")
         # Find UIDs to remove (this is simplified - in production, track UIDs per source)
         # For now, we'll rebuild from scratch if removals are needed
         # In a production system, you'd maintain a source->UIDs mapping
-        print("Note: Full removal requires rebuild. Processing updates...")
+        log.info("Note: Full removal requires rebuild. Processing updates...")
     
     # Add/update chunks
-    to_process = to_add + to_update
-    if to_process:
-        print(f"Processing {len(to_process)} sources...")
-        for source_info in to_process:
-            source = source_info["source"]
-            file_path = source_info["path"]
-            
-            print(f"  Processing: {source}")
-            try:
-                text = read_document(file_path)
-                uids = index.add_chunks(source, text, chunk_id_prefix=source)
-                print(f"    Added {len(uids)} chunks")
-            except Exception as e:
-                print(f"    Error processing {source}: {e}")
+    if items:
+        # Embed chunks of all sources together in large batches. A failed batch
+        # leaves the index unchanged, so retry per source to isolate the bad one.
+        try:
+            uids_per_item = index.add_chunks_bulk(items)
+        except Exception as e:
+            log.warning(f"Batched embedding failed ({e}); retrying per source...")
+            uids_per_item = []
+            for source, text, chunk_id_prefix in items:
+                try:
+                    uids_per_item.append(index.add_chunks(source, text, chunk_id_prefix=chunk_id_prefix))
+                except Exception as e:
+                    log.error(f"    Error processing {source}: {e}")
+                    uids_per_item.append(None)
+        for (source, _, _), uids in zip(items, uids_per_item):
+            if uids is not None:
+                log.info(f"  Added {len(uids)} chunks: {source}")
     
     # Create new build directory
     new_build_id = now_build_id()
     new_build_dir = os.path.join(builds_dir, new_build_id)
-    print(f"Saving index to build: {new_build_id}")
+    log.info(f"Saving index to build: {new_build_id}")
     index.save(new_build_dir)
     
     # Update manifest
     manifest["current_build_id"] = new_build_id
+    manifest["hash_algo"] = SOURCE_HASH_ALGO
     if "builds" not in manifest:
         manifest["builds"] = {}
     manifest["builds"][new_build_id] = {
@@ -184,8 +243,9 @@ def main():
     # Update sources.json
     save_sources_json(settings.RAG_STORE_ROOT, scanned_dict)
     
-    print(f"Update complete! New build ID: {new_build_id}")
+    log.info(f"Update complete! New build ID: {new_build_id}")
 
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     main()
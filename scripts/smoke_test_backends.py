@@ -4,6 +4,7 @@ import sys
 import asyncio
 import time
 from pathlib import Path
+import aiohttp
 
 # Add parent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
@@ -15,8 +16,8 @@ from app.services.llm.backends.vllm_backend import VLLMBackend
 from app.services.llm.backends.trtllm_backend import TRTLLMBackend
 
 
-async def test_backend(backend_name: str):
-    """Test a specific backend."""
+async def test_backend(backend_name: str, session: aiohttp.ClientSession):
+    """Test a specific backend (on the caller's session)."""
     print(f"\n{'='*60}")
     print(f"Testing backend: {backend_name.upper()}")
     print(f"{'='*60}")
@@ -26,14 +27,15 @@ async def test_backend(backend_name: str):
     model_id = os.getenv("MODEL_ID", settings.MODEL_ID)
     timeout = settings.REQUEST_TIMEOUT_S
     
+    backend = None
     try:
         # Create backend instance directly
         if backend_name == "ollama":
-            backend = OllamaBackend(base_url, model_id, timeout)
+            backend = OllamaBackend(base_url, model_id, timeout, session=session)
         elif backend_name == "vllm":
-            backend = VLLMBackend(base_url, model_id, timeout)
+            backend = VLLMBackend(base_url, model_id, timeout, session=session)
         elif backend_name == "trtllm":
-            backend = TRTLLMBackend(base_url, model_id, timeout)
+            backend = TRTLLMBackend(base_url, model_id, timeout, session=session)
         else:
             print(f"❌ FAILED: Unknown backend {backend_name}")
             return False
@@ -89,11 +91,13 @@ Output only the JSON, no additional text."""
         return False
     
     finally:
-        # Close backend session if exists
-        if hasattr(backend, 'close'):
+        # Injected session is left open for the next backend; never swallow cancellation
+        if backend is not None:
             try:
                 await backend.close()
-            except:
+            except asyncio.CancelledError:
+                raise
+            except Exception:
                 pass
 
 
@@ -105,10 +109,12 @@ async def main():
     backends = ["ollama", "vllm", "trtllm"]
     results = {}
     
-    for backend_name in backends:
-        success = await test_backend(backend_name)
-        results[backend_name] = success
-        await asyncio.sleep(1)  # Brief pause between tests
+    # One session (connection pool) shared by all backends
+    async with aiohttp.ClientSession() as session:
+        for backend_name in backends:
+            success = await test_backend(backend_name, session)
+            results[backend_name] = success
+            await asyncio.sleep(1)  # Brief pause between tests
     
     # Summary
     print(f"\n{'='*60}")